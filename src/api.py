@@ -0,0 +1,300 @@
+import io
+import json
+from datetime import date, datetime, timedelta
+from flask import Blueprint, Response, request, stream_with_context
+from sqlalchemy.exc import IntegrityError
+from model import db, Artist, Venue, Show, DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
+from helpers import helper, timeline, pagination, facets, importer, scheduling, listings, deletion
+from helpers.cache import response_cache
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+STREAM_BATCH_SIZE = 1000
+
+VENUE_FIELDS = {
+    "id": Venue.id,
+    "name": Venue.name,
+    "city": Venue.city,
+    "state": Venue.state,
+    "address": Venue.address,
+    "phone": Venue.phone,
+    "website": Venue.website,
+    "facebook_link": Venue.facebook_link,
+    "seeking_talent": Venue.seeking_talent,
+    "seeking_description": Venue.seeking_description,
+    "image_link": Venue.image_link,
+    "updated_at": Venue.updated_at
+}
+
+ARTIST_FIELDS = {
+    "id": Artist.id,
+    "name": Artist.name,
+    "city": Artist.city,
+    "state": Artist.state,
+    "phone": Artist.phone,
+    "website": Artist.website,
+    "facebook_link": Artist.facebook_link,
+    "seeking_venue": Artist.seeking_venue,
+    "seeking_description": Artist.seeking_description,
+    "image_link": Artist.image_link,
+    "updated_at": Artist.updated_at
+}
+
+SHOW_FIELDS = {
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+    "start_time": Show.start_time,
+    "end_time": Show.end_time,
+    "updated_at": Show.updated_at
+}
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        Exception.__init__(self, message)
+        self.message = message
+        self.status = status
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return _json_response({"error": error.message}), error.status
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+def list_venues():
+    columns = _select_fields(VENUE_FIELDS)
+    query = facets.filter_by_facets(db.session.query(*columns), Venue, **facets.get_facet_filters(request.args))
+    return _list_response(query, [Venue.id], [int])
+
+@api.route('/venues/<int:venue_id>')
+def get_venue(venue_id):
+    venue = Venue.query.filter(Venue.id == venue_id, deletion.live(Venue)).first()
+    if venue is None:
+        raise ApiError('venue not found', 404)
+    data = _entity_to_dict(venue, VENUE_FIELDS)
+    data["genres"] = helper.get_genres_list(venue.genres)
+    data.update(timeline.get_venue_timeline(venue_id))
+    return _json_response(data)
+
+MAX_RANGE_DAYS = 92
+
+@api.route('/venues/<int:venue_id>/free-slots')
+def get_venue_free_slots(venue_id):
+    if db.session.query(Venue.id).filter(Venue.id == venue_id, deletion.live(Venue)).first() is None:
+        raise ApiError('venue not found', 404)
+    start, end = _parse_range()
+    try:
+        min_length = timedelta(minutes=int(request.args.get('min_minutes', 0)))
+    except ValueError:
+        raise ApiError('min_minutes must be an integer')
+    slots = scheduling.get_free_slots(venue_id, start, end, min_length)
+    return _json_response({
+        "venue_id": venue_id,
+        "from": start,
+        "to": end,
+        "data": [{"start_time": slot_start, "end_time": slot_end} for slot_start, slot_end in slots]
+    })
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+def list_artists():
+    columns = _select_fields(ARTIST_FIELDS)
+    query = facets.filter_by_facets(db.session.query(*columns), Artist, **facets.get_facet_filters(request.args))
+    return _list_response(query, [Artist.id], [int])
+
+@api.route('/artists/<int:artist_id>')
+def get_artist(artist_id):
+    artist = Artist.query.filter(Artist.id == artist_id, deletion.live(Artist)).first()
+    if artist is None:
+        raise ApiError('artist not found', 404)
+    data = _entity_to_dict(artist, ARTIST_FIELDS)
+    data["genres"] = helper.get_genres_list(artist.genres)
+    data.update(timeline.get_artist_timeline(artist_id))
+    return _json_response(data)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+def list_shows():
+    columns = _select_fields(SHOW_FIELDS)
+    query = db.session.query(*columns).select_from(Show).join(
+        Venue, Venue.id == Show.venue_id
+    ).join(
+        Artist, Artist.id == Show.artist_id
+    ).filter(deletion.live(Venue), deletion.live(Artist))
+    return _list_response(
+        query,
+        [Show.start_time, Show.venue_id, Show.artist_id],
+        [pagination.parse_datetime, int, int]
+    )
+
+@api.route('/shows/batch', methods=['POST'])
+def create_show_batch():
+    # {"venue_id", "artist_id", "duration_minutes"?, and either "start_times": [...]
+    # or "recurrence": {"start", "frequency", "interval"?, "count" | "until"}}
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        raise ApiError('expected a JSON object')
+    try:
+        venue_id = int(body['venue_id'])
+        artist_id = int(body['artist_id'])
+        duration = int(body.get('duration_minutes') or DEFAULT_SHOW_MINUTES)
+        if 'recurrence' in body:
+            start_times = _parse_recurrence(body['recurrence'])
+        else:
+            start_times = [pagination.parse_datetime(value) for value in body['start_times']]
+    except KeyError as e:
+        raise ApiError('missing field: %s' % e.args[0])
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ApiError('invalid batch: %s' % e)
+    if not 0 < duration <= MAX_SHOW_MINUTES:
+        raise ApiError('duration_minutes must be between 1 and %d' % MAX_SHOW_MINUTES)
+    if len(start_times) > scheduling.MAX_OCCURRENCES:
+        raise ApiError('a batch can have at most %d shows' % scheduling.MAX_OCCURRENCES)
+    try:
+        report = scheduling.book_shows(venue_id, artist_id, start_times, timedelta(minutes=duration))
+        db.session.commit()
+    except LookupError as e:
+        db.session.rollback()
+        raise ApiError(str(e), 404)
+    except IntegrityError:
+        # a concurrent booking got in between the check and the insert
+        db.session.rollback()
+        raise ApiError('the schedule changed while booking; nothing was created, retry', 409)
+    if report.count('created'):
+        response_cache.invalidate('venue:%d' % venue_id, 'artist:%d' % artist_id, 'shows')
+    return _json_response(report.to_dict())
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+@api.route('/calendar')
+def list_calendar():
+    start, end = _parse_range()
+    columns = _select_fields(SHOW_FIELDS)
+    query = listings.listings_query(columns, start, end, **facets.get_facet_filters(request.args))
+    return _list_response(
+        query,
+        [Show.start_time, Show.venue_id, Show.artist_id],
+        [pagination.parse_datetime, int, int]
+    )
+
+#  Import
+#  ----------------------------------------------------------------
+
+MAX_REPORTED_REJECTS = 100
+
+@api.route('/import/<kind>', methods=['POST'])
+def import_data(kind):
+    if kind not in importer.LOADERS:
+        raise ApiError('unknown import kind: ' + kind, 404)
+    upload = request.files.get('file')
+    if upload is None:
+        raise ApiError('missing file')
+    fmt = request.args.get('format') or importer.guess_format(upload.filename or '')
+    if fmt not in ('csv', 'ndjson'):
+        raise ApiError('unsupported format: ' + fmt)
+    rejects = io.StringIO()
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    report = importer.import_stream(
+        kind, stream, fmt,
+        batch_size=pagination.get_page_size(request.args.get('batch_size'), importer.DEFAULT_BATCH_SIZE, importer.MAX_BATCH_SIZE),
+        rejects=rejects
+    )
+    data = report.to_dict()
+    data["rejects"] = [json.loads(line) for line in rejects.getvalue().splitlines()[:MAX_REPORTED_REJECTS]]
+    return _json_response(data)
+
+#  Helpers
+#  ----------------------------------------------------------------
+
+def _select_fields(available):
+    requested = request.args.get('fields')
+    if not requested:
+        return [column.label(name) for name, column in available.items()]
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError('unknown fields: ' + ', '.join(unknown))
+    return [available[name].label(name) for name in names]
+
+def _list_response(query, key_columns, parsers):
+    # key columns are always selected so cursors can be built from any row
+    selected = [column['name'] for column in query.column_descriptions]
+    hidden = [column for column in key_columns if column.key not in selected]
+    if hidden:
+        query = query.add_columns(*[column.label(column.key) for column in hidden])
+
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return _stream_response(query.order_by(*key_columns), selected)
+
+    cursor = request.args.get('after')
+    cursor_values = None
+    if cursor:
+        try:
+            cursor_values = pagination.decode_cursor(cursor, parsers)
+        except ValueError:
+            raise ApiError('invalid cursor')
+    rows, next_cursor = pagination.keyset_page(
+        query, key_columns, cursor_values, pagination.get_page_size(request.args.get('limit')))
+    return _json_response({
+        "data": [_row_to_dict(row, selected) for row in rows],
+        "next": next_cursor
+    })
+
+def _stream_response(query, selected):
+    # stream_results asks the driver for a server-side cursor, so memory
+    # stays bounded by STREAM_BATCH_SIZE however many rows are exported
+    rows = query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+
+    def generate():
+        for row in rows:
+            yield json.dumps(_row_to_dict(row, selected), default=_json_default) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _parse_range():
+    # from and to are ISO dates or datetimes; to is exclusive
+    try:
+        start = pagination.parse_datetime(request.args['from'])
+        end = pagination.parse_datetime(request.args['to'])
+    except (KeyError, ValueError):
+        raise ApiError('from and to must be ISO dates or datetimes')
+    if not start < end or end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise ApiError('the range must be positive and at most %d days' % MAX_RANGE_DAYS)
+    return start, end
+
+def _parse_recurrence(recurrence):
+    until = recurrence.get('until')
+    if until is not None:
+        # a bare date covers that whole day
+        until = date.fromisoformat(until) if len(until) == 10 else pagination.parse_datetime(until)
+    count = recurrence.get('count')
+    return scheduling.expand_recurrence(
+        pagination.parse_datetime(recurrence['start']),
+        recurrence.get('frequency', 'weekly'),
+        int(recurrence.get('interval', 1)),
+        int(count) if count is not None else None,
+        until
+    )
+
+def _row_to_dict(row, selected):
+    return {name: getattr(row, name) for name in selected}
+
+def _entity_to_dict(entity, available):
+    return {name: getattr(entity, name) for name in available}
+
+def _json_response(data):
+    return Response(json.dumps(data, default=_json_default), mimetype='application/json')
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(repr(value))
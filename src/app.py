@@ -3,367 +3,278 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
+import functools
 import sys
-import magicattr
-from flask import ( render_template, request, Response, flash, redirect, url_for )
+import time
+import click
+from flask import Flask, current_app, render_template
+from flask.cli import with_appcontext
+from flask_moment import Moment
 import logging
 from logging import Formatter, FileHandler
-from model import db, app, Artist, Venue, Show
-from flask_wtf import Form
-from forms import *
-from helpers import helper
+from datetime import datetime
+import config
+from model import db
+from helpers import importer, metrics, routing, counters, templates, snapshot, deletion, jobs
+from helpers.cache import response_cache, GENERATION_TAG
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@functools.lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # parsing the pattern and loading the locale data is most of babel's cost per call
+  import babel.dates
+  locale = babel.Locale.parse(locale or babel.dates.LC_TIME)
+  pattern = DATETIME_FORMATS.get(format, format)
+  if pattern in ('short', 'medium', 'long', 'full'):
+    # babel's named formats: the locale's date and time patterns joined by its datetime format
+    pattern = babel.dates.get_datetime_format(pattern, locale).replace(
+      '{0}', babel.dates.get_time_format(pattern, locale).pattern
+    ).replace('{1}', babel.dates.get_date_format(pattern, locale).pattern)
+  return babel.dates.parse_pattern(pattern), locale
+
+def format_datetime(value, format='medium', locale=None):
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
 
-app.jinja_env.filters['datetime'] = format_datetime
+#----------------------------------------------------------------------------#
+# App.
+#----------------------------------------------------------------------------#
+
+def create_app(config_object=None):
+  app = Flask(__name__)
+  app.config.from_object(config_object or config.get_config())
+  db.init_app(app)
+  Moment(app)
+  if click.get_current_context(silent=True) is not None:
+    # alembic is most of the import time and only the flask CLI (flask db ...)
+    # needs it, so web workers never load it
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+  app.jinja_env.filters['datetime'] = format_datetime
+  templates.init_app(app)
+  jobs.init_app(app)
+
+  register_blueprints(app)
+  register_instrumentation(app)
+  register_commands(app)
+
+  if app.config['ASYNC_MODE']:
+    import async_views
+    async_views.init_app(app)
+
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
+  if not app.debug:
+    register_error_log(app)
+  return app
+
+#----------------------------------------------------------------------------#
+# Blueprints.
+#----------------------------------------------------------------------------#
+
+def register_blueprints(app):
+  from views import venues, artists, shows
+  from api import api
+  app.add_url_rule('/', 'index', index)
+  app.register_blueprint(venues.blueprint)
+  app.register_blueprint(artists.blueprint)
+  app.register_blueprint(shows.blueprint)
+  app.register_blueprint(api)
+
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+def register_instrumentation(app):
+  routing.init_app(app)
+  metrics.init_app(app)
+  metrics.registry.add_collector(
+    'fyyur_response_cache_events_total', 'Response cache hits, misses, evictions and invalidations.', 'counter',
+    lambda: {(('event', event),): value for event, value in response_cache.stats().items() if event != 'entries'}
+  )
+  metrics.registry.add_collector(
+    'fyyur_template_bytecode_cache_total', 'Template loads answered from the bytecode cache (hits) or compiled (misses).', 'counter',
+    lambda: {(('event', event),): value for event, value in templates.bytecode_cache_stats(app).items()}
+  )
+  metrics.registry.add_collector(
+    'fyyur_jobs', 'Rows in the job queue by state, as of this process\'s last worker pass.', 'gauge',
+    jobs.worker.depth_stats
+  )
+  metrics.registry.add_collector(
+    'fyyur_jobs_lag_seconds', 'How long the oldest due job has been waiting.', 'gauge',
+    jobs.worker.lag_stats
+  )
+  metrics.registry.add_collector(
+    'fyyur_jobs_processed_total', 'Jobs run by this process, by outcome.', 'counter',
+    jobs.worker.event_stats
+  )
+  metrics.registry.add_collector(
+    'fyyur_db_pool_connections', 'Connections in the primary engine pool by state.', 'gauge',
+    lambda: metrics.pool_stats(db.get_engine(app).pool)
+  )
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
 def index():
   return render_template('pages/home.html')
 
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
 
-#  Venues
-#  ----------------------------------------------------------------
+def server_error(error):
+    return render_template('errors/500.html'), 500
 
-@app.route('/venues')
-def venues():
-  areas_query = db.session.query(db.func.count(Venue.id).label('venues_count'), Venue.city, Venue.state).group_by(Venue.city, Venue.state)
-  areas = areas_query.all()
-  venues = db.session.query(Venue).all()
-  data = []
-
-  for area in areas:
-    data.append(
-      {
-        "city": area.city,
-        "state": area.state,
-        "venues": helper.get_venues_by_areas(area, venues)
-      }
-    )
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
 
-  return render_template('pages/venues.html', areas=data);
-
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-  search_term = request.form.get('search_term', '')
-  venues = Venue.query.filter(Venue.name.ilike('%'+search_term+'%')).all()
-  response = {
-    "count": len(venues),
-    "data": []
-  }
-
-  for venue in venues:
-    response["data"].append(
-      {
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": helper.get_upcoming_shows_counter(venue.shows)
-      }
-    )
+def register_commands(app):
+  for command in (import_data, roll_show_stats, check_show_stats, purge_deleted, run_jobs, compile_templates, export_snapshot, restore_snapshot):
+    app.cli.add_command(command)
 
-  return render_template('pages/search_venues.html', results=response, search_term=search_term)
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-
-  venue = Venue.query.get(venue_id)
-  shows = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).all()
-  data = {
-    "id": venue.id,
-    "name": venue.name,
-    "genres": helper.get_genres_list(venue.genres),
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_description,
-    "image_link": venue.image_link,
-    "past_shows": helper.get_formatted_past_shows(shows),
-    "upcoming_shows": helper.get_formatted_upcoming_shows(shows),
-    "past_shows_count": helper.get_past_shows_counter(shows),
-    "upcoming_shows_count": helper.get_upcoming_shows_counter(shows)
-  }
-  return render_template('pages/show_venue.html', venue=data)
-
-#  Create Venue
+#  Import
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
-def create_venue_form():
-  form = VenueForm()
-  return render_template('forms/new_venue.html', form=form)
+@click.command('import-data')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(importer.LOADERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=importer.DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--checkpoint', help='File recording the last committed line, to resume an interrupted import.')
+@click.option('--rejects', help='NDJSON file receiving rows that failed validation.')
+def import_data(kind, path, fmt, batch_size, checkpoint, rejects):
+  start = time.perf_counter()
+  report = importer.import_file(kind, path, fmt, batch_size, checkpoint, rejects)
+  elapsed = time.perf_counter() - start
+  click.echo(json.dumps(report.to_dict()))
+  click.echo('%d rows in %.2fs (%.0f rows/s)' % (report.read, elapsed, report.read / elapsed if elapsed else 0))
+
+#  Show counters
+#  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['POST'])
-def create_venue_submission():
-  try:
-    new_venue = Venue(
-    name = request.form['name'],
-    city = request.form['city'],
-    state = request.form['state'],
-    address = request.form['address'],
-    phone = request.form['phone'],
-    genres = request.form.get('genres', ''),
-    facebook_link = request.form.get('facebook_link', ''),
-    website = request.form.get('website',''),
-    image_link = request.form.get('image_link', ''),
-    seeking_talent = bool(request.form.get('seeking_talent', False)),
-    seeking_description = request.form.get('seeking_description', '')
-    )
-    db.session.add(new_venue)
+@click.command('roll-show-stats', help='Move shows that have started into the past counters. Run it from cron.')
+@with_appcontext
+def roll_show_stats():
+  rolled = counters.roll_forward()
+  db.session.commit()
+  for model, ids in rolled.items():
+    tag = model.__tablename__.lower()
+    response_cache.invalidate(tag + 's', *['%s:%d' % (tag, id) for id in ids])
+    click.echo('%s: %d rolled forward' % (model.__tablename__, len(ids)))
+
+@click.command('check-show-stats', help='Recompute the show counters from the shows table and report drift.')
+@with_appcontext
+@click.option('--fix', is_flag=True, help='Recompute the rows that drifted.')
+def check_show_stats(fix):
+  drifted = 0
+  for model in counters.SHOW_COLUMNS:
+    drift = counters.find_drift(model)
+    for id, stored, expected in drift:
+      click.echo('%s %d: stored %s, expected %s' % (model.__tablename__, id, stored, expected))
+    if fix and drift:
+      counters.refresh(model, [id for id, _, _ in drift])
+    drifted += len(drift)
+  if fix:
     db.session.commit()
-    flash('Venue ' + request.form['name'] + ' was successfully listed!')
-  except:
-    flash('Venue ' + request.form['name'] + ' could not be listed!')
-    flash(sys.exc_info())
-    db.session.rollback()
-  finally:
-    db.session.close()
-    return render_template('pages/home.html')
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
-  try:
-    venue = Venue.query.filter_by(id=venue_id).first()
-    db.session.delete(venue)
-    db.session.commit()
-  except:
-    db.session.rollback()
-  finally:
-    db.session.close()
-    return render_template('pages/home.html')
+  click.echo('%d rows drifted%s' % (drifted, ', fixed' if fix and drifted else ''))
+  if drifted and not fix:
+    sys.exit(1)
 
-#  Artists
+#  Deletes
 #  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  data = db.session.query(Artist.id, Artist.name).all()
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
-def search_artists():
-  search_term = request.form.get('search_term', '')
-  artists = Artist.query.filter(Artist.name.ilike('%'+search_term+'%')).all()
-  response = {
-    "count": len(artists),
-    "data": []
-  }
-
-  for artist in artists:
-    response["data"].append(
-      {
-        "id": artist.id,
-        "name": artist.name,
-        "num_upcoming_shows": helper.get_upcoming_shows_counter(artist.shows)
-      }
-    )
 
-  return render_template('pages/search_artists.html', results=response, search_term=search_term)
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  artist = Artist.query.filter_by(id=artist_id).first()
-  shows = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).all()
-  data = {
-    "id": artist.id,
-    "name": artist.name,
-    "genres": helper.get_genres_list(artist.genres),
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venue,
-    "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link,
-    "past_shows": helper.get_formatted_past_shows_for_artist(shows),
-    "upcoming_shows": helper.get_formatted_upcoming_shows_for_artist(shows),
-    "past_shows_count": helper.get_past_shows_counter(shows),
-    "upcoming_shows_count": helper.get_upcoming_shows_counter(shows)
-  }
-  return render_template('pages/show_artist.html', artist=data)
-
-#  Update
+@click.command('purge-deleted', help='Purge soft-deleted venues and artists now, e.g. after their purge jobs failed.')
+@with_appcontext
+@click.option('--batch-size', default=deletion.PURGE_BATCH_SIZE, show_default=True)
+def purge_deleted(batch_size):
+  purged = deletion.purge_deleted(batch_size)
+  for (model, id), touched in purged.items():
+    click.echo('%s %d purged, %d counters recomputed' % (model.__tablename__, id, len(touched)))
+  if purged:
+    response_cache.invalidate('venues', 'artists')
+  click.echo('%d purged' % len(purged))
+
+#  Jobs
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
-def edit_artist(artist_id):
-  form = ArtistForm()
-
-  raw_artist = Artist.query.filter_by(id=artist_id).first()
-  attribs = list(filter(lambda a: not a.startswith('_'), dir(raw_artist)))
-  for attrib in attribs:
-    if hasattr(form, attrib):
-      magicattr.set(form, attrib+'.data', getattr(raw_artist, attrib, ''))
-
-  artist = vars(raw_artist)
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
-
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
-def edit_artist_submission(artist_id):
-  artist = Artist.query.filter_by(id=artist_id).first()
-  try:
-    artist.name = request.form.get("name", "")
-    artist.city = request.form.get("city", "")
-    artist.state = request.form.get("state", "")
-    artist.genres = request.form.get("genres", "")
-    artist.phone = request.form.get("phone", "")
-    artist.image_link = request.form.get("image_link", "")
-    artist.facebook_link = request.form.get("facebook_link", "")
-    artist.seeking_venue = bool(request.form.get('seeking_venue', False))
-    artist.seeking_description = request.form.get('seeking_description', '')
-    artist.website = request.form.get('website', '')
-    db.session.commit()
-  except:
-    db.session.rollback()
-  finally:
-    db.session.close()
-    return redirect(url_for('show_artist', artist_id=artist_id))
-
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
-def edit_venue(venue_id):
-  form = VenueForm()
-
-  raw_venue = Venue.query.filter_by(id=venue_id).first()
-  attribs = list(filter(lambda a: not a.startswith('_'), dir(raw_venue)))
-  for attrib in attribs:
-    if hasattr(form, attrib):
-      magicattr.set(form, attrib+'.data', getattr(raw_venue, attrib, ''))
-
-  venue = vars(raw_venue)
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
-
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
-def edit_venue_submission(venue_id):
-  venue = Venue.query.filter_by(id=venue_id).first()
-  try:
-    venue.name = request.form.get("name", "")
-    venue.city = request.form.get("city", "")
-    venue.state = request.form.get("state", "")
-    venue.genres = request.form.get("genres", "")
-    venue.phone = request.form.get("phone", "")
-    venue.image_link = request.form.get("image_link", "")
-    venue.facebook_link = request.form.get("facebook_link", "")
-    venue.seeking_talent = bool(request.form.get('seeking_talent', False))
-    venue.seeking_description = request.form.get('seeking_description', '')
-    venue.website = request.form.get('website', '')
-    
-    db.session.commit()
-  except:
-    db.session.rollback()
-  finally:
-    db.session.close()
-    return redirect(url_for('show_venue', venue_id=venue_id))
 
-#  Create Artist
+@click.command('run-jobs', help='Run queued follow-up jobs, for deployments with JOBS_WORKERS=0.')
+@with_appcontext
+@click.option('--once', is_flag=True, help='Run what is due and exit, e.g. from cron.')
+@click.option('--poll', default=1.0, show_default=True, help='Seconds between looks at the queue.')
+def run_jobs(once, poll):
+  if once:
+    click.echo('%d jobs run' % jobs.run_pending())
+    for state, (count, _) in sorted(jobs.get_depth().items()):
+      click.echo('%s: %d' % (state, count))
+    return
+  jobs.worker.run_forever(poll)
+
+#  Templates
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
-def create_artist_form():
-  form = ArtistForm()
-  return render_template('forms/new_artist.html', form=form)
+@click.command('compile-templates', help='Fill the template bytecode cache, e.g. during a deploy.')
+@with_appcontext
+def compile_templates():
+  # boot already loaded everything into memory; start over so each template goes through the bytecode cache
+  app = current_app._get_current_object()
+  app.jinja_env.cache.clear()
+  count, elapsed = templates.precompile(app)
+  click.echo('%d templates in %.1fms (%s)' % (count, elapsed * 1000, json.dumps(templates.bytecode_cache_stats(app))))
 
-@app.route('/artists/create', methods=['POST'])
-def create_artist_submission():
-  try:
-    new_artist = Artist(
-    name = request.form.get('name',''),
-    city = request.form.get('city',''),
-    state = request.form.get('state',''),
-    phone = request.form.get('phone',''),
-    genres = request.form.get('genres', ''),
-    facebook_link = request.form.get('facebook_link', ''),
-    website = request.form.get('website',''),
-    image_link = request.form.get('image_link', ''),
-    seeking_venue = bool(request.form.get('seeking_venue', False)),
-    seeking_description = request.form.get('seeking_description', '')
-    )
-    db.session.add(new_artist)
-    db.session.commit()
-    flash('Artist ' + request.form['name'] + ' was successfully listed!')
-  except:
-    flash('Artist ' + request.form['name'] + ' could not be listed!')
-    flash(sys.exc_info())
-    db.session.rollback()
-  finally:
-    db.session.close()
-    return render_template('pages/home.html')
-
-#  Shows
+#  Snapshots
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
-def shows():
-  shows = Show.query.all()
-  data = []
-
-  for show in shows:
-    data.append(
-      {
-        "venue_id": show.venue_id,
-        "venue_name": show.venue.name,
-        "artist_id": show.artist_id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": str(show.start_time)
-      }
-    )
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
-def create_shows():
-  # renders form. do not touch.
-  form = ShowForm()
-  return render_template('forms/new_show.html', form=form)
-
-@app.route('/shows/create', methods=['POST'])
-def create_show_submission():
+@click.command('export-snapshot', help='Write venues, artists and shows to a directory of compressed column chunks.')
+@with_appcontext
+@click.argument('path', type=click.Path(file_okay=False))
+@click.option('--chunk-rows', default=snapshot.CHUNK_ROWS, show_default=True)
+def export_snapshot(path, chunk_rows):
   try:
-    new_show = Show(
-    artist_id = request.form.get('artist_id',''),
-    venue_id = request.form.get('venue_id',''),
-    start_time = request.form.get('start_time', datetime.now()),
-    )
-    db.session.add(new_show)
-    db.session.commit()
-    flash('Show was successfully listed!')
-  except:
-    flash('An error occurred. Show could not be listed')
-    flash(sys.exc_info())
-    db.session.rollback()
-  finally:
-    db.session.close()
-    return render_template('pages/home.html')
-
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
+    report = snapshot.export_snapshot(path, chunk_rows)
+  except snapshot.SnapshotError as e:
+    raise click.ClickException(str(e))
+  echo_snapshot_report(report)
+
+@click.command('restore-snapshot', help='Bulk load a snapshot written by export-snapshot.')
+@with_appcontext
+@click.argument('path', type=click.Path(exists=True, file_okay=False))
+@click.option('--replace', is_flag=True, help='Delete the current venues, artists and shows first.')
+def restore_snapshot(path, replace):
+  try:
+    report = snapshot.restore_snapshot(path, replace)
+  except snapshot.SnapshotError as e:
+    raise click.ClickException(str(e))
+  # every page may have changed; the tags reach the other workers' entries through the shared cache
+  response_cache.invalidate('venues', 'artists', 'shows', GENERATION_TAG)
+  echo_snapshot_report(report)
+
+def echo_snapshot_report(report):
+  summary = report.to_dict()
+  for table, counts in summary["tables"].items():
+    click.echo('%s: %d rows, %d bytes' % (table, counts["rows"], counts["bytes"]))
+  seconds = summary["seconds"]
+  click.echo('%d rows in %.2fs (%.0f rows/s)' % (summary["rows"], seconds, summary["rows"] / seconds if seconds else 0))
 
+#----------------------------------------------------------------------------#
+# Logging.
+#----------------------------------------------------------------------------#
 
-if not app.debug:
+def register_error_log(app):
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
         Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
@@ -379,11 +290,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
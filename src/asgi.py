@@ -0,0 +1,160 @@
+import asyncio
+import concurrent.futures
+import io
+import sys
+from flask import request, request_started
+from werkzeug.exceptions import HTTPException
+from helpers import aio
+import async_views
+
+# ASGI entry point: uvicorn --factory asgi:create_application
+#
+# The read routes in async_views run on the server's event loop, so a request
+# waiting on the database holds no thread and separate requests overlap. Every
+# other route is the unchanged WSGI app, run on a fixed pool of
+# ASGI_SYNC_THREADS threads.
+
+class AsgiApp(object):
+    def __init__(self, app):
+        self.app = app
+        self.views = async_views.get_views()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=app.config['ASGI_SYNC_THREADS'], thread_name_prefix='fyyur-asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise RuntimeError('unsupported ASGI scope %s' % scope['type'])
+        aio.database.attach(asyncio.get_running_loop())
+        environ = build_environ(scope, await _read_body(receive))
+        view = self._async_view(environ)
+        if view is None:
+            status, headers, body = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._run_wsgi, environ)
+        else:
+            status, headers, body = await self._dispatch(view, environ)
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _async_view(self, environ):
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            return None
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+        except HTTPException:
+            # 404s, 405s and slash redirects are Flask's to answer
+            return None
+        return self.views.get(rule.endpoint)
+
+    async def _dispatch(self, view, environ):
+        # Flask.wsgi_app and full_dispatch_request, with the view awaited.
+        # The request context lives in this task's contextvars, so requests
+        # interleaved on the loop each see their own request and g.
+        app = self.app
+        ctx = app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                try:
+                    request_started.send(app)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            return _collect(response, environ)
+        except:
+            error = sys.exc_info()[1]
+            raise
+        finally:
+            if error is not None and app.should_ignore_error(error):
+                error = None
+            ctx.pop(error)
+
+    def _run_wsgi(self, environ):
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        chunks = self.app(environ, start_response)
+        try:
+            body = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return started[0], started[1], body
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                aio.database.attach(asyncio.get_running_loop())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await aio.database.close()
+                aio.database.detach(asyncio.get_running_loop())
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def _collect(response, environ):
+    chunks, status, headers = response.get_wsgi_response(environ)
+    try:
+        body = b''.join(chunks)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    return status, headers, body
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope['http_version'],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+def create_application(config_object=None):
+    from app import create_app
+    return AsgiApp(create_app(config_object))
@@ -0,0 +1,111 @@
+import asyncio
+from flask import abort, render_template, request
+from model import db, Artist, Venue, Show, Genre, venue_genres, artist_genres
+from helpers import aio, directory, timeline, pagination, search, facets, conditional, routing, deletion
+from helpers.cache import response_cache
+
+# Async versions of the read routes. Each page's independent statements are
+# awaited together on the shared async engine instead of being issued one
+# after another. Served by asgi.py they run on the server's event loop, so a
+# request waiting on the database holds no thread and one process serves as
+# many at once as the pool has connections. Under a WSGI server with
+# ASYNC_MODE set they replace the sync views, but each request still holds
+# its WSGI thread and the gain is only the overlap within a page.
+
+async def venues():
+    filters = facets.get_facet_filters(request.args)
+    areas, facet_counts = await asyncio.gather(
+        directory.get_venue_areas_async(**filters),
+        facets.get_facet_counts_async(Venue, **filters)
+    )
+    return render_template('pages/venues.html', areas=areas, facets=facet_counts, filters=filters)
+
+async def search_venues():
+    search_term = request.form.get('search_term', '')
+    response = await search.search_async(Venue, search_term)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+async def show_venue(venue_id):
+    venue, genres, shows = await asyncio.gather(
+        aio.fetch_one(Venue.__table__.select().where(Venue.id == venue_id, deletion.live(Venue))),
+        aio.fetch(_genres_query(venue_genres, venue_genres.c.venue_id, venue_id)),
+        timeline.get_venue_timeline_async(venue_id)
+    )
+    if venue is None:
+        abort(404)
+    data = venue._asdict()
+    data["genres"] = [row.name for row in genres]
+    data.update(shows)
+    response_cache.tag(*['artist:%d' % show["artist_id"] for show in data["past_shows"] + data["upcoming_shows"]])
+    return render_template('pages/show_venue.html', venue=data)
+
+async def artists():
+    filters = facets.get_facet_filters(request.args)
+    data, facet_counts = await asyncio.gather(
+        aio.fetch(facets.filter_by_facets(db.session.query(Artist.id, Artist.name), Artist, **filters)),
+        facets.get_facet_counts_async(Artist, **filters)
+    )
+    return render_template('pages/artists.html', artists=data, facets=facet_counts, filters=filters)
+
+async def search_artists():
+    search_term = request.form.get('search_term', '')
+    response = await search.search_async(Artist, search_term)
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+async def show_artist(artist_id):
+    artist, genres, shows = await asyncio.gather(
+        aio.fetch_one(Artist.__table__.select().where(Artist.id == artist_id, deletion.live(Artist))),
+        aio.fetch(_genres_query(artist_genres, artist_genres.c.artist_id, artist_id)),
+        timeline.get_artist_timeline_async(artist_id)
+    )
+    if artist is None:
+        abort(404)
+    data = artist._asdict()
+    data["genres"] = [row.name for row in genres]
+    data.update(shows)
+    response_cache.tag(*['venue:%d' % show["venue_id"] for show in data["past_shows"] + data["upcoming_shows"]])
+    return render_template('pages/show_artist.html', artist=data)
+
+async def shows():
+    page_size = pagination.get_page_size(request.args.get('limit'))
+    cursor = request.args.get('after')
+    cursor_values = None
+    if cursor:
+        try:
+            cursor_values = pagination.decode_cursor(cursor, [pagination.parse_datetime, int, int])
+        except ValueError:
+            abort(400)
+    rows, next_cursor = await pagination.keyset_page_async(
+        directory.shows_query(), [Show.start_time, Show.venue_id, Show.artist_id], cursor_values, page_size)
+
+    data = []
+    for row in rows:
+        data.append(row._asdict())
+        response_cache.tag('venue:%d' % row.venue_id, 'artist:%d' % row.artist_id)
+    return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, limit=page_size)
+
+def _genres_query(association, entity_column, entity_id):
+    return db.session.query(Genre.name).join(
+        association, association.c.genre_id == Genre.id
+    ).filter(entity_column == entity_id).order_by(Genre.name)
+
+def get_views():
+    # endpoint -> coroutine view, with the same caching and conditional
+    # handling as the sync routes
+    return {
+        'venues.venues': response_cache.cached_async(lambda: ['venues'])(venues),
+        'venues.search_venues': routing.read_only(search_venues),
+        'venues.show_venue': conditional.conditional_async(conditional.get_venue_validators_async)(
+            response_cache.cached_async(lambda venue_id: ['venue:%d' % venue_id])(show_venue)),
+        'artists.artists': response_cache.cached_async(lambda: ['artists'])(artists),
+        'artists.search_artists': routing.read_only(search_artists),
+        'artists.show_artist': conditional.conditional_async(conditional.get_artist_validators_async)(
+            response_cache.cached_async(lambda artist_id: ['artist:%d' % artist_id])(show_artist)),
+        'shows.shows': response_cache.cached_async(lambda: ['shows'])(shows)
+    }
+
+def init_app(app):
+    # Flask's own ensure_sync would start a thread and a loop per request;
+    # aio.database.sync runs the view on the shared loop instead
+    app.view_functions.update(
+        (endpoint, aio.database.sync(view)) for endpoint, view in get_views().items())
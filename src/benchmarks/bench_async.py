@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import threading
+import time
+from urllib.parse import urlencode
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+from benchmarks.common import app, db, reset_database, seed
+from benchmarks.suite import percentile
+from helpers import aio
+import asgi
+
+ROUTES = [
+    ('venues', 'GET', '/venues', None),
+    ('show_venue', 'GET', '/venues/1', None),
+    ('artists', 'GET', '/artists', None),
+    ('show_artist', 'GET', '/artists/1', None),
+    ('shows', 'GET', '/shows', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'Venue 1'}),
+]
+
+class SimulatedLatency(object):
+    # a local sqlite file answers in microseconds; a networked database does
+    # not. Each statement waits `seconds` first: the sync engine blocks its
+    # thread, the async engine yields to the event loop like a socket read.
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def _block(self, *args, **kwargs):
+        time.sleep(self.seconds)
+
+    def _yield(self, *args, **kwargs):
+        await_only(asyncio.sleep(self.seconds))
+
+    def install(self, engine, async_engine):
+        event.listen(engine, 'before_cursor_execute', self._block)
+        event.listen(async_engine.sync_engine, 'before_cursor_execute', self._yield)
+
+def measure_wsgi(method, path, data, threads, requests):
+    # the sync app as a threaded WSGI server runs it: one request per thread
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(path) if method == 'GET' else client.post(path, data=data)
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, (path, response.status_code)
+            with lock:
+                latencies.append(elapsed)
+
+    per_worker = max(1, requests // threads)
+    workers = [threading.Thread(target=worker, args=(per_worker,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - start
+    return len(latencies) / wall, percentile(latencies, 50) * 1000
+
+async def asgi_request(application, method, path, data):
+    body = urlencode(data or {}).encode('ascii')
+    headers = [(b'host', b'localhost')]
+    if method == 'POST':
+        headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+        'query_string': b'', 'headers': headers, 'server': ('localhost', 80), 'client': ('127.0.0.1', 0)
+    }
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return sent[0]['status']
+
+async def measure_asgi(application, method, path, data, clients, requests):
+    # clients requests in flight at once, each its own task on the server loop
+    latencies = []
+
+    async def client(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            status = await asgi_request(application, method, path, data)
+            assert status == 200, (path, status)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(max(1, requests // clients)) for _ in range(clients)])
+    wall = time.perf_counter() - start
+    return len(latencies) / wall, percentile(latencies, 50) * 1000
+
+async def run_asgi(application, args):
+    results = {}
+    for name, method, path, data in ROUTES:
+        await measure_asgi(application, method, path, data, 1, 1)  # warm up
+        results[name] = await measure_asgi(application, method, path, data, args.clients, args.requests)
+    await aio.database.close()
+    aio.database.detach(asyncio.get_running_loop())
+    return results
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Concurrent requests at a fixed thread count: sync views under WSGI vs async views under asgi.py')
+    # small pages by default, so the run measures waiting on the database rather than rendering
+    parser.add_argument('--venues', type=int, default=50)
+    parser.add_argument('--artists', type=int, default=100)
+    parser.add_argument('--shows', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4, help='WSGI threads, and asgi.py sync threads')
+    parser.add_argument('--clients', type=int, default=32, help='requests in flight against asgi.py')
+    parser.add_argument('--requests', type=int, default=160, help='requests per route and mode')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='simulated round trip per statement')
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        reset_database()
+        seed(venues=args.venues, artists=args.artists, shows=args.shows)
+        db.session.remove()
+        latency = SimulatedLatency(args.latency_ms / 1000.0)
+        latency.install(db.engine, aio.database.get_engine(app))
+
+        wsgi_results = {}
+        for name, method, path, data in ROUTES:
+            measure_wsgi(method, path, data, 1, 1)  # warm up
+            wsgi_results[name] = measure_wsgi(method, path, data, args.threads, args.requests)
+
+    # outside the app context, as under a server: each request pushes its own
+    app.config['ASGI_SYNC_THREADS'] = args.threads
+    asgi_results = asyncio.run(run_asgi(asgi.AsgiApp(app), args))
+
+    # under WSGI a request waiting on the database holds one of the threads;
+    # under asgi.py the read routes hold none, so only the clients bound it
+    print('%d WSGI threads vs asgi.py with %d sync threads and %d requests in flight, %.1fms per statement' % (
+        args.threads, args.threads, args.clients, args.latency_ms))
+    print('%-16s %11s %11s %11s %11s %8s' % ('route', 'wsgi req/s', 'asgi req/s', 'wsgi p50', 'asgi p50', 'speedup'))
+    for name, _, _, _ in ROUTES:
+        wsgi_rps, wsgi_p50 = wsgi_results[name]
+        asgi_rps, asgi_p50 = asgi_results[name]
+        print('%-16s %11.1f %11.1f %11.1f %11.1f %7.2fx' % (
+            name, wsgi_rps, asgi_rps, wsgi_p50, asgi_p50, asgi_rps / wsgi_rps))
+
+if __name__ == '__main__':
+    run()
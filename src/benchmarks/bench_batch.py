@@ -0,0 +1,46 @@
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import app, db, reset_database, seed, QueryCounter
+from model import Show
+
+WEEKS = 26
+
+def residency(venue_id):
+    # a Friday 9pm residency for six months, at its own venue so runs never collide
+    start = datetime(2035, 1, 5, 21, 0) + timedelta(days=7 * WEEKS * venue_id)
+    return [start + timedelta(weeks=week) for week in range(WEEKS)]
+
+def one_by_one(client, venue_id):
+    for start_time in residency(venue_id):
+        response = client.post('/shows/create', data={
+            'venue_id': str(venue_id), 'artist_id': '1', 'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        assert response.status_code == 200
+
+def batch(client, venue_id):
+    start = residency(venue_id)[0]
+    response = client.post('/api/v1/shows/batch', json={
+        'venue_id': venue_id, 'artist_id': 1,
+        'recurrence': {'start': start.isoformat(), 'frequency': 'weekly', 'count': WEEKS}
+    })
+    assert response.status_code == 200 and response.get_json()['created'] == WEEKS, response.data
+
+def run():
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        seed(venues=10, artists=10, shows=1000)
+        db.session.remove()
+        print('%d weekly shows' % WEEKS)
+        print('%-28s %8s %10s' % ('path', 'queries', 'ms'))
+        for venue_id, (name, case) in enumerate([('one POST per show', one_by_one), ('one batch POST', batch)], 1):
+            with QueryCounter(db.engine) as counter:
+                start = time.perf_counter()
+                case(client, venue_id)
+                elapsed = time.perf_counter() - start
+            assert db.session.query(Show).filter(Show.venue_id == venue_id, Show.artist_id == 1).count() >= WEEKS
+            db.session.remove()
+            print('%-28s %8d %10.1f' % (name, counter.count, elapsed * 1000))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,69 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import app, db, reset_database, seed, QueryCounter
+from model import Show, Venue
+
+CALENDAR_INDEXES = [
+    (Show, 'ix_shows_start_time_venue_id_artist_id'),
+    (Venue, 'ix_Venue_city_state'),
+]
+
+def weekend():
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    saturday = today + timedelta(days=(5 - today.weekday()) % 7 or 7)
+    return saturday - timedelta(hours=6), saturday + timedelta(days=2)
+
+def calendar_paths():
+    start, end = weekend()
+    window = 'from=%s&to=%s' % (start.isoformat(), end.isoformat())
+    return [
+        ('weekend', '/api/v1/calendar?' + window),
+        ('weekend, city', '/api/v1/calendar?' + window + '&city=San+Francisco&state=CA'),
+        ('weekend, city, genre', '/api/v1/calendar?' + window + '&city=San+Francisco&state=CA&genre=Jazz'),
+    ]
+
+def measure(client, path, rounds):
+    client.get(path)  # warm up
+    with QueryCounter(db.engine) as counter:
+        response = client.get(path)
+    assert response.status_code == 200, response.data
+    start = time.perf_counter()
+    for _ in range(rounds):
+        client.get(path)
+    return counter.count, (time.perf_counter() - start) * 1000 / rounds
+
+def set_indexes(enabled):
+    for model, name in CALENDAR_INDEXES:
+        index = next(index for index in model.__table__.indexes if index.name == name)
+        if enabled:
+            index.create(db.engine, checkfirst=True)
+        else:
+            index.drop(db.engine, checkfirst=True)
+    # fresh statistics so the planner weighs the indexes that are there now
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+def run():
+    parser = argparse.ArgumentParser(description='Calendar range query as the shows table grows')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma-separated show counts')
+    parser.add_argument('--rounds', type=int, default=20, help='requests per measurement')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print('%9s %-22s %8s %12s %12s' % ('shows', 'query', 'queries', 'ms indexed', 'ms without'))
+    with app.app_context():
+        for size in [int(size) for size in args.sizes.split(',')]:
+            reset_database()
+            seed(venues=max(100, size // 1000), artists=max(100, size // 500), shows=size)
+            db.session.remove()
+            results = {}
+            for enabled in (False, True):
+                set_indexes(enabled)
+                for name, path in calendar_paths():
+                    results.setdefault(name, []).append(measure(client, path, args.rounds))
+            for name, ((_, without), (queries, indexed)) in results.items():
+                print('%9d %-22s %8d %12.2f %12.2f' % (size, name, queries, indexed, without))
+
+if __name__ == '__main__':
+    run()
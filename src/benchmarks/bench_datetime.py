@@ -0,0 +1,33 @@
+import timeit
+from datetime import datetime
+import babel.dates
+import dateutil.parser
+from benchmarks import common  # points DATABASE_URL at a scratch database before app is imported
+import app as views
+
+CALLS = 20000
+
+def previous_format_datetime(value, format='medium'):
+    # the filter as it was: views passed str(start_time) and it parsed it back
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+def run():
+    value = datetime(2035, 5, 21, 21, 30, 0, 123456)
+    cases = [
+        ('before: str -> dateutil -> babel', lambda: previous_format_datetime(str(value), 'full')),
+        ('after: str input (parsed)', lambda: views.format_datetime(str(value), 'full')),
+        ('after: datetime input', lambda: views.format_datetime(value, 'full')),
+    ]
+    assert len(set(case() for _, case in cases)) == 1
+    print('%-34s %12s' % ('filter call', 'us per call'))
+    for name, case in cases:
+        elapsed = min(timeit.repeat(case, number=CALLS, repeat=3))
+        print('%-34s %12.2f' % (name, elapsed * 1e6 / CALLS))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,64 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import app, db, reset_database, seed, QueryCounter, _insert_chunked
+from model import Venue, Show
+from helpers import deletion
+
+def add_long_running_venue(venue_id, shows):
+    # a venue with a show every three hours, spread over its artists
+    start = datetime(2000, 1, 1)
+    _insert_chunked(Show, (
+        {
+            "venue_id": venue_id,
+            "artist_id": 1 + i % 100,
+            "start_time": start + timedelta(hours=3 * i),
+            "end_time": start + timedelta(hours=3 * i + 2)
+        } for i in range(shows)
+    ))
+
+def orm_delete(venue_id):
+    # an ORM cascade as the old handler relied on: every show is loaded and
+    # deleted by primary key in the request's transaction. (The handler itself
+    # failed here: without a delete cascade the ORM tried to blank the shows'
+    # venue_id, which is part of their primary key.)
+    venue = Venue.query.filter_by(id=venue_id).first()
+    for show in venue.shows:
+        db.session.delete(show)
+    db.session.delete(venue)
+    db.session.commit()
+
+def soft_delete(venue_id):
+    deletion.soft_delete(Venue, venue_id)
+    db.session.commit()
+
+def run():
+    parser = argparse.ArgumentParser(description='Deleting a venue with many shows')
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=deletion.PURGE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with app.app_context():
+        reset_database()
+        seed(venues=100, artists=100, shows=10000)
+        for venue_id in (1, 2):
+            add_long_running_venue(venue_id, args.shows)
+        db.session.remove()
+
+        print('venue with %d shows' % args.shows)
+        print('%-30s %8s %10s' % ('step', 'queries', 'ms'))
+        for name, case, venue_id in (
+            ('ORM delete, in the request', orm_delete, 1),
+            ('soft delete, in the request', soft_delete, 2),
+            ('batched purge, in background', lambda venue_id: deletion.purge(Venue, venue_id, args.batch_size), 2)
+        ):
+            with QueryCounter(db.engine) as counter:
+                start = time.perf_counter()
+                case(venue_id)
+                elapsed = time.perf_counter() - start
+            db.session.remove()
+            print('%-30s %8d %10.1f' % (name, counter.count, elapsed * 1000))
+        assert db.session.query(Show).filter(Show.venue_id.in_([1, 2])).count() == 0
+
+if __name__ == '__main__':
+    run()
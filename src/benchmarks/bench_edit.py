@@ -0,0 +1,82 @@
+import timeit
+from flask import render_template
+from werkzeug.datastructures import MultiDict
+from benchmarks.common import app, db, reset_database, seed, QueryCounter
+from model import Venue
+from forms import VenueForm
+from helpers import helper, editing
+
+CALLS = 500
+
+def previous_populate(venue_id):
+    # the handler as it was; setattr on the field stands in for magicattr.set(form, name + '.data', ...)
+    form = VenueForm()
+    raw_venue = Venue.query.filter_by(id=venue_id).first()
+    attribs = list(filter(lambda a: not a.startswith('_'), dir(raw_venue)))
+    for attrib in attribs:
+        if hasattr(form, attrib):
+            setattr(getattr(form, attrib), 'data', getattr(raw_venue, attrib, ''))
+    form.genres.data = helper.get_genres_list(raw_venue.genres)
+    return form, vars(raw_venue)
+
+def populate(venue_id):
+    venue, genres = editing.load_form_data(Venue, venue_id)
+    form = VenueForm()
+    editing.populate_form(form, Venue, venue, genres)
+    return form, venue
+
+def render(form, venue):
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+def previous_edit_venue_submission(venue_id, data):
+    venue = Venue.query.filter_by(id=venue_id).first()
+    for name, value in editing.form_values(Venue, data).items():
+        setattr(venue, name, value)
+    venue.genres = editing.facets.get_or_create_genres(data.getlist('genres'))
+    db.session.commit()
+    db.session.close()
+
+def edit_venue_submission(venue_id, data):
+    if editing.apply_changes(Venue, venue_id, data):
+        db.session.commit()
+    db.session.close()
+
+def measure(case):
+    with QueryCounter(db.engine) as counter:
+        case()
+    elapsed = min(timeit.repeat(case, number=CALLS, repeat=3))
+    return counter.count, elapsed * 1e6 / CALLS
+
+def run():
+    with app.app_context():
+        reset_database()
+        seed(venues=100, artists=100, shows=1000)
+        db.session.remove()
+        data, genres = editing.load_form_data(Venue, 1)
+        unchanged = MultiDict([(name, value) for name, value in data._asdict().items() if name != 'id' and value not in (None, False)])
+        unchanged.setlist('genres', genres)
+        renamed = unchanged.copy()
+
+        with app.test_request_context('/venues/1/edit'):
+            assert render(*previous_populate(1)) == render(*populate(1))
+            cases = [
+                ('populate, before: dir() + vars()', lambda: previous_populate(1)),
+                ('populate, after: projection', lambda: populate(1)),
+                ('populate + render, before', lambda: render(*previous_populate(1))),
+                ('populate + render, after', lambda: render(*populate(1))),
+                ('submit unchanged, before', lambda: previous_edit_venue_submission(1, unchanged)),
+                ('submit unchanged, after', lambda: edit_venue_submission(1, unchanged)),
+            ]
+
+            def rename():
+                renamed['name'] = 'Venue 1' if renamed['name'] != 'Venue 1' else 'Venue One'
+                edit_venue_submission(1, renamed)
+            cases.append(('submit one change, after', rename))
+
+            print('%-36s %8s %12s' % ('path', 'queries', 'us per call'))
+            for name, case in cases:
+                queries, elapsed = measure(case)
+                print('%-36s %8d %12.1f' % (name, queries, elapsed))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,37 @@
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import app, reset_database, seed
+from helpers import importer
+
+def write_shows_csv(path, rows, venues, artists, seed=7):
+    rnd = random.Random(seed)
+    start = datetime(2030, 1, 1)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['venue_id', 'artist_id', 'start_time'])
+        for i in range(rows):
+            start_time = start + timedelta(minutes=i)
+            writer.writerow([rnd.randint(1, venues), rnd.randint(1, artists), start_time.strftime('%Y-%m-%d %H:%M:%S')])
+
+def run(rows=100000, batch_sizes=(100, 1000, 5000)):
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    write_shows_csv(path, rows, 1000, 1000)
+    print('%10s %10s %10s %12s' % ('batch', 'rows', 'seconds', 'rows/s'))
+    with app.app_context():
+        for batch_size in batch_sizes:
+            reset_database()
+            seed(venues=1000, artists=1000, shows=0)
+            start = time.perf_counter()
+            report = importer.import_file('shows', path, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            print('%10d %10d %10.2f %12.0f' % (batch_size, report.inserted, elapsed, report.read / elapsed))
+    os.remove(path)
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
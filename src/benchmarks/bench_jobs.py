@@ -0,0 +1,62 @@
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from benchmarks.common import app, db, reset_database, seed, QueryCounter
+from model import Venue, Artist, Show, Job
+from helpers import counters, jobs
+
+def book(venue_id, artist_id, start_time, follow_up):
+    db.session.execute(Show.__table__.insert().values(
+        venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=start_time + timedelta(hours=2)))
+    follow_up(venue_id, artist_id)
+    db.session.commit()
+
+def inline(venue_id, artist_id):
+    # the follow-up work done in the request, as before
+    counters.refresh(Venue, [venue_id])
+    counters.refresh(Artist, [artist_id])
+
+def queued(venue_id, artist_id):
+    jobs.enqueue('refresh-counters', venue_ids=[venue_id], artist_ids=[artist_id])
+
+def run():
+    parser = argparse.ArgumentParser(description='Write latency with follow-up work inline or queued')
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--writes', type=int, default=500)
+    args = parser.parse_args()
+
+    # this process drains the queue itself, after the writes
+    app.config['JOBS_WORKERS'] = 0
+    jobs.worker.init_app(app)
+    with app.app_context():
+        reset_database()
+        seed(venues=100, artists=100, shows=args.shows)
+        db.session.remove()
+
+        print('%d writes against %d shows' % (args.writes, args.shows))
+        print('%-22s %8s %10s %10s' % ('follow-up', 'queries', 'p50 ms', 'p95 ms'))
+        start_time = datetime(2040, 1, 1)
+        for name, follow_up in (('inline', inline), ('queued', queued)):
+            latencies = []
+            with QueryCounter(db.engine) as counter:
+                for i in range(args.writes):
+                    start_time += timedelta(days=1)
+                    start = time.perf_counter()
+                    book(1 + i % 100, 1 + (i * 7) % 100, start_time, follow_up)
+                    latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            print('%-22s %8.1f %10.2f %10.2f' % (
+                name, counter.count / float(args.writes),
+                statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000))
+        db.session.remove()
+
+        start = time.perf_counter()
+        ran = jobs.run_pending()
+        elapsed = time.perf_counter() - start
+        assert db.session.query(Job).count() == 0
+        assert not counters.find_drift(Venue) and not counters.find_drift(Artist)
+        print('drained %d jobs in %.2fs (%.0f jobs/s)' % (ran, elapsed, ran / elapsed))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,57 @@
+import argparse
+import shutil
+import tempfile
+import time
+from benchmarks.common import app, db, reset_database, seed
+from helpers import snapshot
+
+def table_counts():
+    return {
+        table.name: db.session.execute(db.select(db.func.count()).select_from(table)).scalar()
+        for table in snapshot.TABLES
+    }
+
+def shows_checksum():
+    # cheap fingerprint of the shows table: any lost, duplicated or shifted row changes it
+    return tuple(db.session.query(
+        db.func.sum(snapshot.Show.venue_id * 7 + snapshot.Show.artist_id * 13),
+        db.func.min(snapshot.Show.start_time),
+        db.func.max(snapshot.Show.start_time),
+        db.func.count(snapshot.Show.end_time)
+    ).one())
+
+def run():
+    parser = argparse.ArgumentParser(description='Snapshot export and restore throughput')
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--chunk-rows', type=int, default=snapshot.CHUNK_ROWS)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix='fyyur-snapshot-')
+    try:
+        with app.app_context():
+            reset_database()
+            start = time.perf_counter()
+            seed(venues=max(100, args.shows // 100), artists=max(100, args.shows // 100), shows=args.shows)
+            print('seeded %d shows in %.1fs' % (args.shows, time.perf_counter() - start))
+            counts = table_counts()
+            checksum = shows_checksum()
+            db.session.remove()
+
+            exported = snapshot.export_snapshot(path, args.chunk_rows).to_dict()
+            reset_database()
+            restored = snapshot.restore_snapshot(path).to_dict()
+            assert table_counts() == counts, (table_counts(), counts)
+            assert shows_checksum() == checksum
+            db.session.remove()
+
+        print('%-14s %10s %12s %10s' % ('table', 'rows', 'bytes', 'bytes/row'))
+        for table, entry in exported["tables"].items():
+            print('%-14s %10d %12d %10.1f' % (table, entry["rows"], entry["bytes"], entry["bytes"] / entry["rows"] if entry["rows"] else 0))
+        print('%-14s %10s %12s' % ('phase', 'seconds', 'rows/s'))
+        for name, summary in (('export', exported), ('restore', restored)):
+            print('%-14s %10.2f %12.0f' % (name, summary["seconds"], summary["rows"] / summary["seconds"]))
+    finally:
+        shutil.rmtree(path)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.common import app, db, reset_database, seed
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules a web worker should not load before it needs them
+DEFERRED = ['alembic', 'flask_migrate', 'wtforms', 'forms', 'babel', 'dateutil', 'sqlalchemy.ext.asyncio', 'async_views']
+
+# runs in a fresh interpreter, so every import is paid for again
+WORKER = '''
+import json, sys, time
+start = time.perf_counter()
+import click
+import app
+imported = time.perf_counter()
+if {cli}:
+    with click.Context(click.Command('db')):
+        application = app.create_app()
+else:
+    application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get({path!r})
+assert response.status_code == 200, response.status_code
+answered = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "create_app": created - imported,
+    "first_response": answered - created,
+    "loaded": [name for name in {deferred!r} if name in sys.modules]
+}}))
+'''
+
+def sample(cli, path):
+    code = WORKER.format(cli=cli, path=path, deferred=DEFERRED)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=SRC_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+def run():
+    parser = argparse.ArgumentParser(description='Worker startup: import time and time to first response')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with app.app_context():
+        reset_database()
+        seed(venues=100, artists=100, shows=1000)
+        db.session.remove()
+
+    cases = [
+        ('worker, GET /', False, '/'),
+        ('worker, GET /venues', False, '/venues'),
+        ('flask CLI, GET /', True, '/'),
+    ]
+    phases = ['import', 'create_app', 'first_response', 'process']
+    print('median of %d fresh processes' % args.runs)
+    print('%-22s %10s %12s %16s %12s  %s' % ('case', 'import ms', 'create ms', 'first resp ms', 'process ms', 'deferred modules loaded'))
+    for name, cli, path in cases:
+        samples = [sample(cli, path) for _ in range(args.runs)]
+        medians = [statistics.median(s[phase] for s in samples) * 1000 for phase in phases]
+        print('%-22s %10.1f %12.1f %16.1f %12.1f  %s' % ((name,) + tuple(medians) + (', '.join(samples[-1]["loaded"]) or '-',)))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,46 @@
+import tempfile
+import time
+from benchmarks.common import app
+from helpers import templates
+
+ROUNDS = 200
+
+def load_all(env, names):
+    start = time.perf_counter()
+    for name in names:
+        env.get_template(name)
+    return time.perf_counter() - start
+
+def fresh_environment(bytecode_cache):
+    env = app.create_jinja_environment()
+    env.filters.update(app.jinja_env.filters)
+    env.bytecode_cache = bytecode_cache
+    return env
+
+def run():
+    names = templates.template_names(app)
+    cache_dir = tempfile.mkdtemp(prefix='fyyur-jinja-bench-')
+    results = {}
+
+    # each phase gets a fresh environment so earlier phases leave nothing in memory
+    env = fresh_environment(None)
+    results['parse + compile (no cache)'] = load_all(env, names)
+
+    env = fresh_environment(templates.CountingBytecodeCache(cache_dir))
+    results['compile, fill bytecode cache'] = load_all(env, names)
+
+    env = fresh_environment(templates.CountingBytecodeCache(cache_dir))
+    results['load from bytecode cache'] = load_all(env, names)
+
+    for auto_reload in (True, False):
+        env.auto_reload = auto_reload
+        elapsed = sum(load_all(env, names) for _ in range(ROUNDS)) / ROUNDS
+        results['in memory, auto_reload=%s' % auto_reload] = elapsed
+
+    print('%d templates' % len(names))
+    print('%-32s %10s %14s' % ('phase', 'total ms', 'per template us'))
+    for phase, elapsed in results.items():
+        print('%-32s %10.2f %14.1f' % (phase, elapsed * 1000, elapsed * 1e6 / len(names)))
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,21 @@
+from benchmarks.common import app, db, reset_database, seed, timed, QueryCounter
+
+SIZES = [10, 100, 1000, 5000]
+
+def run():
+    client = app.test_client()
+    print('%8s %8s %10s' % ('venues', 'queries', 'ms'))
+    with app.app_context():
+        for size in SIZES:
+            reset_database()
+            seed(venues=size, artists=size, shows=size * 5)
+            db.session.remove()
+            with QueryCounter(db.engine) as counter:
+                results = {}
+                with timed(results, 'venues'):
+                    response = client.get('/venues')
+            assert response.status_code == 200
+            print('%8d %8d %10.1f' % (size, counter.count, results['venues'] * 1000))
+
+if __name__ == '__main__':
+    run()
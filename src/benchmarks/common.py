@@ -0,0 +1,121 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# benchmarks run against a throwaway sqlite file unless DATABASE_URL points elsewhere
+if 'DATABASE_URL' not in os.environ:
+    _fd, _path = tempfile.mkstemp(suffix='.db', prefix='fyyur-bench-')
+    os.close(_fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + _path
+
+from sqlalchemy import event
+from app import create_app
+from model import db, Artist, Venue, Show, Genre, venue_genres, artist_genres
+from helpers import counters
+
+app = create_app()
+# measure the work behind each page, not the response cache in front of it
+app.config['CACHE_ENABLED'] = False
+
+CITIES = [
+    ('San Francisco', 'CA'),
+    ('New York', 'NY'),
+    ('Austin', 'TX'),
+    ('Seattle', 'WA'),
+    ('Chicago', 'IL'),
+]
+GENRES = ['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Soul', 'Pop']
+
+def reset_database():
+    db.drop_all()
+    db.create_all()
+
+SEED_CHUNK_SIZE = 10000
+
+def seed(venues=100, artists=100, shows=1000, seed=42):
+    rnd = random.Random(seed)
+    now = datetime.now()
+    _insert_chunked(Venue, (
+        {
+            "id": i,
+            "name": "Venue %d" % i,
+            "city": CITIES[i % len(CITIES)][0],
+            "state": CITIES[i % len(CITIES)][1],
+            "address": "%d Main St" % i,
+            "seeking_talent": bool(i % 2)
+        } for i in range(1, venues + 1)
+    ))
+    _insert_chunked(Artist, (
+        {
+            "id": i,
+            "name": "Artist %d" % i,
+            "city": CITIES[i % len(CITIES)][0],
+            "state": CITIES[i % len(CITIES)][1],
+            "seeking_venue": bool(i % 2)
+        } for i in range(1, artists + 1)
+    ))
+    _insert_chunked(Genre, (
+        {"id": i, "name": name} for i, name in enumerate(GENRES, 1)
+    ))
+    _insert_chunked(venue_genres, (
+        {"venue_id": i, "genre_id": genre_id}
+        for i in range(1, venues + 1) for genre_id in rnd.sample(range(1, len(GENRES) + 1), 2)
+    ))
+    _insert_chunked(artist_genres, (
+        {"artist_id": i, "genre_id": genre_id}
+        for i in range(1, artists + 1) for genre_id in rnd.sample(range(1, len(GENRES) + 1), 2)
+    ))
+    _insert_chunked(Show, (
+        {
+            "venue_id": rnd.randint(1, venues),
+            "artist_id": rnd.randint(1, artists),
+            # unique per row so the composite primary key never collides
+            "start_time": now + timedelta(days=rnd.randint(-365, 365), seconds=i)
+        } for i in range(shows)
+    ))
+    # bulk inserts bypass the show counters, so compute them once at the end
+    counters.refresh(Venue, now=now)
+    counters.refresh(Artist, now=now)
+    db.session.commit()
+
+def _insert_chunked(target, rows):
+    # chunks keep memory flat when seeding millions of shows
+    table = getattr(target, '__table__', target)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+
+class QueryCounter(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        # follow-up jobs run on the worker's threads after the response, not as part of it
+        if threading.current_thread().name.startswith('fyyur-jobs'):
+            return
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+@contextmanager
+def timed(results, key):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
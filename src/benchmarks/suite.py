@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from benchmarks.common import app, db, reset_database, seed, QueryCounter
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SHOW_START = datetime(2035, 1, 1, 20, 0)
+
+def show_start(n):
+    # a day apart, so every timed request books a new show instead of hitting a conflict
+    return (SHOW_START + timedelta(days=n)).strftime('%Y-%m-%d %H:%M:%S')
+
+def alternate(*values):
+    # each request changes the record, so edits write rather than no-op
+    return lambda n: values[n % len(values)]
+
+def deleted(path):
+    # a different seeded row per request, from id 2 up; 1 is the one the other routes read
+    return lambda n: path % (n + 2)
+
+# (name, method, path, form data); {venue}/{artist} are filled from the seeded
+# ids, and callables, as the path or a form value, get a per-request sequence number
+ROUTES = [
+    ('index', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('venues_faceted', 'GET', '/venues?genre=Jazz&state=CA', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'Venue 1'}),
+    ('show_venue', 'GET', '/venues/{venue}', None),
+    ('create_venue_form', 'GET', '/venues/create', None),
+    ('edit_venue', 'GET', '/venues/{venue}/edit', None),
+    ('artists', 'GET', '/artists', None),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'Artist 2'}),
+    ('show_artist', 'GET', '/artists/{artist}', None),
+    ('edit_artist', 'GET', '/artists/{artist}/edit', None),
+    ('create_artist_form', 'GET', '/artists/create', None),
+    ('shows', 'GET', '/shows', None),
+    ('create_shows', 'GET', '/shows/create', None),
+    ('api_venues', 'GET', '/api/v1/venues', None),
+    ('api_venue', 'GET', '/api/v1/venues/{venue}', None),
+    ('api_artists', 'GET', '/api/v1/artists', None),
+    ('api_shows', 'GET', '/api/v1/shows', None),
+    ('metrics', 'GET', '/metrics', None),
+    ('create_venue_submission', 'POST', '/venues/create',
+        {'name': 'Bench Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 St', 'phone': '1', 'genres': 'Jazz'}),
+    ('edit_venue_submission', 'POST', '/venues/{venue}/edit',
+        {'name': 'Venue 1', 'city': alternate('Austin', 'Dallas'), 'state': 'TX', 'genres': alternate('Jazz', 'Blues')}),
+    ('create_artist_submission', 'POST', '/artists/create',
+        {'name': 'Bench Artist', 'city': 'Austin', 'state': 'TX', 'phone': '1', 'genres': 'Jazz'}),
+    ('edit_artist_submission', 'POST', '/artists/{artist}/edit',
+        {'name': 'Artist 1', 'city': alternate('Austin', 'Dallas'), 'state': 'TX', 'genres': alternate('Jazz', 'Blues')}),
+    ('create_show_submission', 'POST', '/shows/create',
+        {'venue_id': '{venue}', 'artist_id': '{artist}', 'start_time': show_start}),
+    # last: each deletion queues a purge job that runs in the background
+    ('delete_venue', 'DELETE', deleted('/venues/%d'), None),
+    ('delete_artist', 'DELETE', deleted('/artists/%d'), None),
+]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def request(client, method, path, data, sequence=None):
+    if sequence is not None:
+        n = next(sequence)
+        if callable(path):
+            path = path(n)
+        if data:
+            data = {key: value(n) if callable(value) else value for key, value in data.items()}
+    if method == 'GET':
+        return client.get(path)
+    if method == 'DELETE':
+        return client.delete(path)
+    return client.post(path, data=data)
+
+def measure_route(route, requests, concurrency, ids):
+    name, method, path, data = route
+    if not callable(path):
+        path = path.format(**ids)
+    sequence = None
+    if data:
+        data = {key: value if callable(value) else value.format(**ids) for key, value in data.items()}
+    if callable(path) or data:
+        sequence = itertools.count()
+    client = app.test_client()
+    request(client, method, path, data, sequence)  # warm up
+
+    with QueryCounter(db.engine) as counter:
+        response = request(client, method, path, data, sequence)
+    if response.status_code >= 400:
+        raise RuntimeError('%s answered %d' % (name, response.status_code))
+
+    tracemalloc.start()
+    request(client, method, path, data, sequence)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        worker_client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            request(worker_client, method, path, data, sequence)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    per_worker = max(1, requests // concurrency)
+    threads = [threading.Thread(target=worker, args=(per_worker,)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "queries": counter.count,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": len(latencies) / wall,
+        "peak_kb": peak / 1024.0
+    }
+
+def compare(results, baseline, threshold, metric='p50_ms', min_delta_ms=10.0):
+    # query counts must not grow at all; latency may drift within the
+    # threshold, and differences below min_delta_ms are treated as noise
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["queries"] > expected["queries"]:
+            failures.append('%s: %d queries per request, baseline %d' % (name, result["queries"], expected["queries"]))
+        limit = max(expected[metric] * (1 + threshold), expected[metric] + min_delta_ms)
+        if result[metric] > limit:
+            failures.append('%s: %s %.1fms, baseline %.1fms (+%d%% allowed)' % (
+                name, metric.split('_')[0], result[metric], expected[metric], threshold * 100))
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fyyur route benchmarks')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=50, help='requests per route in the load phase')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--only', help='comma-separated route names')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true', help='exit non-zero on regressions against the baseline')
+    parser.add_argument('--threshold', type=float, default=1.0, help='allowed slowdown, as a fraction')
+    parser.add_argument('--metric', choices=['p50_ms', 'p95_ms', 'p99_ms'], default='p50_ms',
+                        help='latency percentile compared against the baseline')
+    args = parser.parse_args(argv)
+
+    routes = ROUTES
+    if args.only:
+        names = set(args.only.split(','))
+        routes = [route for route in ROUTES if route[0] in names]
+
+    with app.app_context():
+        reset_database()
+        seed(venues=args.venues, artists=args.artists, shows=args.shows)
+        db.session.remove()
+        ids = {"venue": 1, "artist": 1}
+        results = {}
+        print('%-26s %7s %9s %9s %9s %9s %10s' % ('route', 'queries', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'peak KB'))
+        for route in routes:
+            result = measure_route(route, args.requests, args.concurrency, ids)
+            results[route[0]] = {key: round(value, 1) for key, value in result.items()}
+            print('%-26s %7d %9.1f %9.1f %9.1f %9.1f %10.0f' % (
+                route[0], result["queries"], result["p50_ms"], result["p95_ms"],
+                result["p99_ms"], result["rps"], result["peak_kb"]))
+    # ru_maxrss is reported in kilobytes on Linux
+    print('peak RSS: %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('baseline written to %s' % args.baseline)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print('no baseline at %s; run with --save-baseline first' % args.baseline)
+            return 1
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.threshold, args.metric)
+        for failure in failures:
+            print('REGRESSION ' + failure)
+        return 1 if failures else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
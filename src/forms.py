@@ -1,7 +1,8 @@
 from datetime import datetime
-from flask_wtf import Form
-from wtforms import (StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField)
-from wtforms.validators import DataRequired, AnyOf, URL
+from flask_wtf import FlaskForm
+from wtforms import (StringField, SelectField, SelectMultipleField, DateTimeField, DateField, BooleanField, IntegerField)
+from wtforms.validators import DataRequired, URL, NumberRange, Optional
+from model import DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
 
 states = [
     ('AL', 'AL'),
@@ -79,7 +80,7 @@ genres = [
     ('Other', 'Other'),
 ]
 
-class ShowForm(Form):
+class ShowForm(FlaskForm):
     artist_id = StringField(
         'artist_id'
     )
@@ -91,8 +92,22 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_MINUTES)],
+        default=DEFAULT_SHOW_MINUTES
+    )
+    repeat = SelectField(
+        'repeat',
+        choices=[('', 'Does not repeat'), ('daily', 'Daily'), ('weekly', 'Weekly')],
+        default=''
+    )
+    repeat_until = DateField(
+        'repeat_until',
+        validators=[Optional()]
+    )
 
-class VenueForm(Form):
+class VenueForm(FlaskForm):
     name = StringField(
         'name', validators=[DataRequired()]
     )
@@ -130,7 +145,7 @@ class VenueForm(Form):
         'seeking_description'
     )
 
-class ArtistForm(Form):
+class ArtistForm(FlaskForm):
     name = StringField(
         'name', validators=[DataRequired()]
     )
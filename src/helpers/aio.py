@@ -0,0 +1,147 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import random
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context
+import config
+from helpers import metrics, routing
+
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+def async_uri(uri):
+    scheme, separator, rest = uri.partition('://')
+    driver = ASYNC_DRIVERS.get(scheme.split('+')[0])
+    if driver is None:
+        raise RuntimeError('no asyncio driver for %s' % scheme)
+    return driver + separator + rest
+
+def engine_options(uri, app):
+    options = config.engine_options(
+        uri,
+        app.config['DB_POOL_SIZE'],
+        app.config['DB_MAX_OVERFLOW'],
+        app.config['DB_POOL_RECYCLE'],
+        app.config['DB_POOL_TIMEOUT'],
+        app.config['DB_STATEMENT_TIMEOUT_MS']
+    )
+    if uri.startswith('sqlite') and uri not in ('sqlite://', 'sqlite:///:memory:'):
+        # aiosqlite starts a thread per connection, so keep some pooled; like
+        # the sync engine there is no server limit to stay under
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        options = {'poolclass': AsyncAdaptedQueuePool, 'pool_size': app.config['DB_POOL_SIZE'], 'max_overflow': -1}
+    if 'connect_args' in options:
+        # asyncpg takes server settings directly rather than a libpq options string
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(app.config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return options
+
+class AsyncDatabase(object):
+    # One event loop per process runs every async view and owns every async
+    # engine, so pooled connections never cross loops. Under asgi.py that is
+    # the server's loop and views run on it directly. Under a WSGI server it
+    # is a thread of its own: worker threads hand their view over and block
+    # until it finishes, so the loop only overlaps the statements of a page.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._engines = {}
+
+    def get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='fyyur-aio', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def attach(self, loop):
+        with self._lock:
+            if self._loop is not None and self._loop is not loop:
+                raise RuntimeError('async engines already belong to another event loop')
+            self._loop = loop
+
+    def detach(self, loop):
+        # the server is done with its loop; a later one may attach
+        with self._lock:
+            if self._loop is loop:
+                self._loop = None
+
+    def get_engine(self, app):
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        replicas = app.config.get('SQLALCHEMY_REPLICA_URIS')
+        if replicas and has_request_context() and g.get('db_route') == routing.REPLICA:
+            uri = random.choice(replicas)
+        with self._lock:
+            engine = self._engines.get(uri)
+            if engine is None:
+                # only ASYNC_MODE gets here; sync workers never load the asyncio extension
+                from sqlalchemy.ext.asyncio import create_async_engine
+                engine = self._engines[uri] = create_async_engine(async_uri(uri), **engine_options(uri, app))
+            return engine
+
+    def run(self, coroutine):
+        # the task runs in a copy of the caller's context, so request, g and
+        # the app context stay visible to the view on the loop thread
+        context = contextvars.copy_context()
+        done = concurrent.futures.Future()
+
+        def start():
+            task = context.run(asyncio.ensure_future, coroutine)
+            task.add_done_callback(lambda task: _copy_result(task, done))
+
+        self.get_loop().call_soon_threadsafe(start)
+        return done.result()
+
+    def sync(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return self.run(view(*args, **kwargs))
+        return wrapper
+
+    def dispose(self):
+        asyncio.run_coroutine_threadsafe(self.close(), self.get_loop()).result()
+
+    async def close(self):
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
+            await engine.dispose()
+
+database = AsyncDatabase()
+
+async def fetch(query):
+    # query is a Query or a Core selectable; it is only compiled here, never run on db.session
+    statement = getattr(query, 'statement', query)
+    engine = database.get_engine(current_app)
+    stats = metrics.current_stats()
+    start = time.perf_counter()
+    rows = await _execute(engine, statement)
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+    return rows
+
+async def fetch_one(query):
+    rows = await fetch(query)
+    return rows[0] if rows else None
+
+def _copy_result(task, future):
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+async def _execute(engine, statement):
+    # a connection per statement lets independent queries run side by side
+    async with engine.connect() as connection:
+        result = await connection.execute(statement)
+        return result.all()
@@ -0,0 +1,314 @@
+import fnmatch
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request, session
+from helpers import routing
+
+# every entry carries this tag, so bumping it drops the whole cache in every worker
+GENERATION_TAG = 'generation'
+
+class LRUCache(object):
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+class SharedCache(object):
+    # wraps a redis-like client (get/set with ex=/delete/incr/mget/scan_iter) so several
+    # workers share entries; expiry and eviction are left to the server
+    def __init__(self, client, ttl=60, prefix='fyyur:page:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        # SCAN rather than KEYS, so a large cache does not block the server
+        keys = []
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            keys.append(key)
+            if len(keys) == 500:
+                self.client.delete(*keys)
+                keys = []
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+class DictClient(object):
+    # in-process stand-in for the shared cache server, for tests and local runs
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, match)]
+        return iter(keys)
+
+    def incr(self, key):
+        with self._lock:
+            _, value = self._data.get(key, (None, 0))
+            value = int(value) + 1
+            self._data[key] = (None, value)
+            return value
+
+class LocalTagVersions(object):
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._written_at = 0.0
+
+    def get_many(self, tags):
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+            self._written_at = time.time()
+
+    def written_at(self):
+        return self._written_at
+
+class SharedTagVersions(object):
+    def __init__(self, client, prefix='fyyur:tag:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, tags):
+        if not tags:
+            return []
+        return [int(version or 0) for version in self.client.mget([self.prefix + tag for tag in tags])]
+
+    def bump(self, tag):
+        self.client.incr(self.prefix + tag)
+        self.client.set(self.prefix + '@written_at', repr(time.time()))
+
+    def written_at(self):
+        value = self.client.get(self.prefix + '@written_at')
+        return float(value) if value is not None else 0.0
+
+class ResponseCache(object):
+    # entries remember the version of every tag they were rendered under;
+    # a write bumps the versions of the tags it touches, which turns exactly
+    # the affected entries into misses
+    def __init__(self):
+        self.store = None
+        self.tags = None
+        self.invalidations = 0
+
+    def configure(self, config):
+        client = config.get('CACHE_SHARED_CLIENT')
+        if client is None and config.get('CACHE_REDIS_URL'):
+            import redis
+            client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        if client is not None:
+            self.store = SharedCache(client, ttl=config.get('CACHE_TTL', 60))
+            self.tags = SharedTagVersions(client)
+        else:
+            self.store = LRUCache(
+                max_entries=config.get('CACHE_MAX_ENTRIES', 1024),
+                ttl=config.get('CACHE_TTL', 60)
+            )
+            self.tags = LocalTagVersions()
+
+    def _ensure_configured(self):
+        if self.store is None:
+            self.configure(current_app.config)
+
+    def cached(self, tags=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._should_cache():
+                    return view(*args, **kwargs)
+                body, pending = self._lookup(tags, kwargs)
+                if pending is None:
+                    return body
+                body = view(*args, **kwargs)
+                self._store(pending, body)
+                return body
+            return wrapper
+        return decorator
+
+    def cached_async(self, tags=None):
+        # the same for a coroutine view
+        def decorator(view):
+            @wraps(view)
+            async def wrapper(*args, **kwargs):
+                if not self._should_cache():
+                    return await view(*args, **kwargs)
+                body, pending = self._lookup(tags, kwargs)
+                if pending is None:
+                    return body
+                body = await view(*args, **kwargs)
+                self._store(pending, body)
+                return body
+            return wrapper
+        return decorator
+
+    def _lookup(self, tags, kwargs):
+        # (body, None) on a hit; otherwise (None, pending) for _store once the view has run
+        self._ensure_configured()
+        key = self._make_key()
+        # a client pinned to the primary after a write must not get
+        # an entry another client rendered from a lagging replica
+        entry = None if self._pinned() else self.store.get(key)
+        if entry is not None:
+            entry_tags, versions, body = entry
+            if self.tags.get_many(entry_tags) == versions:
+                return body, None
+        g.cache_tags = set(tags(**kwargs) if tags else [])
+        g.cache_tags.add(GENERATION_TAG)
+        # read the versions before rendering so a write that lands
+        # mid-render leaves this entry already stale
+        entry_tags = sorted(g.cache_tags)
+        return None, (key, entry_tags, self.tags.get_many(entry_tags))
+
+    def _store(self, pending, body):
+        key, entry_tags, versions = pending
+        if isinstance(body, str) and self._may_store():
+            extra = sorted(g.cache_tags.difference(entry_tags))
+            self.store.set(key, (entry_tags + extra, versions + self.tags.get_many(extra), body))
+
+    def tag(self, *tags):
+        if hasattr(g, 'cache_tags'):
+            g.cache_tags.update(tags)
+
+    def invalidate(self, *tags):
+        self._ensure_configured()
+        for tag in set(tags):
+            self.tags.bump(tag)
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidate(GENERATION_TAG)
+        self.store.clear()
+
+    def stats(self):
+        self._ensure_configured()
+        stats = dict(self.store.stats())
+        stats["invalidations"] = self.invalidations
+        return stats
+
+    def _should_cache(self):
+        # pages carrying flashed messages are one-off renders
+        return (
+            current_app.config.get('CACHE_ENABLED', True)
+            and request.method == 'GET'
+            and '_flashes' not in session
+        )
+
+    def _pinned(self):
+        return time.time() < session.get('primary_until', 0)
+
+    def _may_store(self):
+        # a replica render right after a write may predate it; primary renders are always current
+        if g.get('db_route') != routing.REPLICA:
+            return True
+        pin_seconds = current_app.config.get('DB_PRIMARY_PIN_SECONDS', 5)
+        return time.time() >= self.tags.written_at() + pin_seconds
+
+    def _make_key(self):
+        args = '&'.join('%s=%s' % item for item in sorted(request.args.items(multi=True)))
+        key = request.path + '?' + args
+        if g.get('etag'):
+            # set by helpers.conditional for pages it validates
+            key += '#' + g.etag
+        return key
+
+response_cache = ResponseCache()
@@ -0,0 +1,94 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import abort, g, make_response, request
+from model import db, Artist, Venue, Show
+from helpers import aio
+
+def get_venue_validators(venue_id, now=None):
+    return _get_validators(Venue, Show.venue_id, Artist, Show.artist_id, venue_id, now)
+
+def get_artist_validators(artist_id, now=None):
+    return _get_validators(Artist, Show.artist_id, Venue, Show.venue_id, artist_id, now)
+
+async def get_venue_validators_async(venue_id, now=None):
+    query = _validators_query(Venue, Show.venue_id, Artist, Show.artist_id, venue_id, now)
+    return _format_validators(Venue, venue_id, await aio.fetch_one(query))
+
+async def get_artist_validators_async(artist_id, now=None):
+    query = _validators_query(Artist, Show.artist_id, Venue, Show.venue_id, artist_id, now)
+    return _format_validators(Artist, artist_id, await aio.fetch_one(query))
+
+def conditional(get_validators):
+    # answers 304 from timestamps alone, before any show is loaded or template rendered
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            validators = get_validators(*args, **kwargs)
+            response = _not_modified(validators)
+            if response is None:
+                response = _with_validators(make_response(view(*args, **kwargs)), validators)
+            return response
+        return wrapper
+    return decorator
+
+def conditional_async(get_validators):
+    # the same for a coroutine view, with validators read on the async engine
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            validators = await get_validators(*args, **kwargs)
+            response = _not_modified(validators)
+            if response is None:
+                response = _with_validators(make_response(await view(*args, **kwargs)), validators)
+            return response
+        return wrapper
+    return decorator
+
+def _not_modified(validators):
+    if validators is None:
+        abort(404)
+    response = _with_validators(make_response(), validators)
+    if response.make_conditional(request).status_code == 304:
+        return response
+    # the response cache keys its entry on the ETag, so a page whose
+    # validators moved (a show started, or a write not yet invalidated)
+    # is rendered again rather than served stale under the new ETag
+    g.etag = validators[0]
+    return None
+
+def _with_validators(response, validators):
+    etag, last_modified = validators
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+def _get_validators(model, show_column, other_model, other_column, entity_id, now):
+    query = _validators_query(model, show_column, other_model, other_column, entity_id, now)
+    return _format_validators(model, entity_id, query.first())
+
+def _validators_query(model, show_column, other_model, other_column, entity_id, now):
+    now = now or datetime.now()
+    # shows crossing from upcoming to past change the page without any write
+    upcoming_show = db.aliased(Show)
+    upcoming = db.session.query(db.func.count(upcoming_show.start_time)).filter(
+        getattr(upcoming_show, show_column.key) == entity_id, upcoming_show.start_time > now
+    ).label('upcoming_shows_count')
+    return db.session.query(
+        model.updated_at,
+        db.func.max(Show.updated_at).label('shows_updated_at'),
+        db.func.max(other_model.updated_at).label('others_updated_at'),
+        db.func.count(Show.start_time).label('shows_count'),
+        upcoming
+    ).select_from(model).outerjoin(
+        Show, show_column == model.id
+    ).outerjoin(
+        other_model, other_model.id == other_column
+    ).filter(model.id == entity_id, model.deleted_at.is_(None)).group_by(model.id, model.updated_at)
+
+def _format_validators(model, entity_id, row):
+    if row is None:
+        return None
+    last_modified = max(value for value in (row[0], row[1], row[2]) if value is not None)
+    raw = '|'.join(str(value) for value in (model.__tablename__, entity_id) + tuple(row))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest(), last_modified
@@ -0,0 +1,97 @@
+from datetime import datetime
+from model import db, Artist, Venue, Show
+from helpers import helper, jobs, deletion
+from helpers.cache import response_cache
+
+# Venue and Artist carry denormalized show statistics so listings and
+# searches read them straight off the row:
+#   upcoming_shows_count / past_shows_count, and next_show_time, the start of
+#   the earliest upcoming show. Shows whose artist (for a venue) or venue (for
+#   an artist) is soft-deleted are left out, as on the detail pages. Writes that add or remove shows recompute the
+#   affected rows from the shows table, either in their own transaction
+#   (imports, purges) or through a refresh-counters job after the response.
+#   Shows passing into the past are rolled forward from cron.
+SHOW_COLUMNS = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+def refresh(model, ids=None, now=None):
+    # ids=None recomputes every row
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+    query = db.session.query(model)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    return query.update(_computed_values(model, now or datetime.now()), synchronize_session=False)
+
+@jobs.task('refresh-counters')
+def refresh_job(venue_ids=(), artist_ids=()):
+    refresh(Venue, venue_ids)
+    refresh(Artist, artist_ids)
+    db.session.commit()
+    # the venue list is the one cached page that shows the counters
+    response_cache.invalidate('venues')
+
+def roll_forward(now=None):
+    # only rows whose next show has started can be out of date
+    now = now or datetime.now()
+    rolled = {}
+    for model in SHOW_COLUMNS:
+        ids = [id for id, in db.session.query(model.id).filter(model.next_show_time <= now)]
+        refresh(model, ids, now)
+        rolled[model] = ids
+    return rolled
+
+def find_drift(model, now=None):
+    # [(id, stored, expected)] for every row whose counters disagree with the shows table
+    now = now or datetime.now()
+    values = _computed_values(model, now)
+    rows = db.session.query(
+        model.id,
+        model.upcoming_shows_count,
+        model.past_shows_count,
+        model.next_show_time,
+        values[model.upcoming_shows_count].label('expected_upcoming'),
+        values[model.past_shows_count].label('expected_past'),
+        values[model.next_show_time].label('expected_next')
+    ).order_by(model.id)
+    drift = []
+    for row in rows:
+        stored = (row.upcoming_shows_count, row.past_shows_count, row.next_show_time)
+        expected = (row.expected_upcoming, row.expected_past, helper.as_datetime(row.expected_next))
+        if stored != expected:
+            drift.append((row.id, stored, expected))
+    return drift
+
+def _computed_values(model, now):
+    criterion = _live_shows(model)
+    upcoming = _scalar(db.session.query(db.func.count(Show.start_time)).filter(
+        criterion, Show.start_time > now
+    ))
+    past = _scalar(db.session.query(db.func.count(Show.start_time)).filter(
+        criterion, Show.start_time <= now
+    ))
+    return {
+        model.upcoming_shows_count: upcoming,
+        model.past_shows_count: past,
+        model.next_show_time: _next_show_time(criterion, now)
+    }
+
+def _live_shows(model):
+    # the same filter as helpers.timeline
+    show_column, other_model, other_column = deletion.SIDES[model]
+    return db.and_(show_column == model.id, other_column.notin_(deletion.deleted_ids(other_model)))
+
+def _next_show_time(criterion, now):
+    return _scalar(db.session.query(db.func.min(Show.start_time)).filter(
+        criterion, Show.start_time > now
+    ))
+
+def _scalar(query):
+    # scalar_subquery() on SQLAlchemy 1.4, as_scalar() before it
+    if hasattr(query, 'scalar_subquery'):
+        return query.scalar_subquery()
+    return query.as_scalar()
@@ -0,0 +1,77 @@
+from datetime import datetime
+from model import db, Artist, Venue, Show
+from helpers import counters, jobs
+from helpers.cache import response_cache
+
+# Deleting a venue or artist is two steps. soft_delete stamps deleted_at,
+# which every listing, page, edit form and bulk booking filters on, so the row
+# is gone for readers as soon as the request commits. A purge job queued in
+# the same transaction then removes its shows in batches along the
+# (entity, start_time) index, one short transaction each, and finally deletes
+# the row itself; the database cascades that to its genre links, and to any
+# show booked while the purge ran. Nothing is loaded into the session on the
+# way.
+PURGE_BATCH_SIZE = 5000
+
+SIDES = {
+    Venue: (Show.venue_id, Artist, Show.artist_id),
+    Artist: (Show.artist_id, Venue, Show.venue_id),
+}
+MODELS = {model.__tablename__: model for model in SIDES}
+
+def live(model):
+    return model.deleted_at.is_(None)
+
+def deleted_ids(model):
+    # served by the partial ix_<table>_deleted_at index
+    return db.session.query(model.id).filter(model.deleted_at.isnot(None))
+
+def soft_delete(model, entity_id):
+    # False if there is no such row or it is already deleted; the caller commits
+    now = datetime.utcnow()
+    deleted = db.session.query(model).filter(model.id == entity_id, live(model)).update(
+        {model.deleted_at: now, model.updated_at: now}, synchronize_session=False
+    )
+    if deleted:
+        jobs.enqueue('purge', table=model.__tablename__, entity_id=entity_id)
+    return bool(deleted)
+
+def purge(model, entity_id, batch_size=PURGE_BATCH_SIZE):
+    # returns the ids of the other side (artists of a venue, venues of an
+    # artist) whose show counters were recomputed
+    show_column, other_model, other_column = SIDES[model]
+    if not db.session.query(deleted_ids(model).filter(model.id == entity_id).exists()).scalar():
+        return set()
+    # the counters already leave out shows of a soft-deleted row; recount the
+    # other side once up front, and deleting the shows changes nothing more
+    touched = set(id for id, in db.session.query(other_column).filter(show_column == entity_id).distinct())
+    counters.refresh(other_model, touched)
+    db.session.commit()
+    while True:
+        boundary = db.session.query(Show.start_time).filter(show_column == entity_id).order_by(
+            Show.start_time
+        ).offset(batch_size - 1).limit(1).scalar()
+        batch = show_column == entity_id
+        if boundary is not None:
+            batch = db.and_(batch, Show.start_time <= boundary)
+        db.session.query(Show).filter(batch).delete(synchronize_session=False)
+        db.session.commit()
+        if boundary is None:
+            break
+    db.session.execute(model.__table__.delete().where(model.id == entity_id))
+    db.session.commit()
+    return touched
+
+@jobs.task('purge')
+def purge_job(table, entity_id):
+    purge(MODELS[table], entity_id)
+    # purging an artist changes the upcoming counts on the venue list
+    response_cache.invalidate('venues')
+
+def purge_deleted(batch_size=PURGE_BATCH_SIZE):
+    # every soft-deleted row, e.g. ones whose purge job failed for good
+    purged = {}
+    for model in SIDES:
+        for entity_id in [id for id, in deleted_ids(model)]:
+            purged[(model, entity_id)] = purge(model, entity_id, batch_size)
+    return purged
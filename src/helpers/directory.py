@@ -0,0 +1,52 @@
+from model import db, Artist, Venue, Show
+from helpers import aio, facets, deletion
+
+def get_venue_areas(**filters):
+    return group_venues_by_area(venue_areas_query(**filters).all())
+
+async def get_venue_areas_async(**filters):
+    return group_venues_by_area(await aio.fetch(venue_areas_query(**filters)))
+
+def venue_areas_query(**filters):
+    # counts come off the row (see helpers.counters), so no show is touched
+    query = db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+    return facets.filter_by_facets(query, Venue, **filters).order_by(
+        Venue.city, Venue.state, Venue.id
+    )
+
+def shows_query():
+    return db.session.query(
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time
+    ).join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id).filter(
+        deletion.live(Venue), deletion.live(Artist)
+    )
+
+def group_venues_by_area(rows):
+    # rows come ordered by (city, state), so one pass is enough to build the groups
+    areas = []
+    current = None
+    for row in rows:
+        if current is None or (current["city"], current["state"]) != (row.city, row.state):
+            current = {
+                "city": row.city,
+                "state": row.state,
+                "venues": []
+            }
+            areas.append(current)
+        current["venues"].append({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows
+        })
+    return areas
@@ -0,0 +1,95 @@
+from datetime import datetime
+from model import db, Genre, Venue, Artist
+from helpers import facets
+
+# form field -> column, for every field the edit forms carry besides genres
+FORM_FIELDS = {
+    Venue: {
+        "name": Venue.name,
+        "city": Venue.city,
+        "state": Venue.state,
+        "address": Venue.address,
+        "phone": Venue.phone,
+        "image_link": Venue.image_link,
+        "facebook_link": Venue.facebook_link,
+        "website": Venue.website,
+        "seeking_talent": Venue.seeking_talent,
+        "seeking_description": Venue.seeking_description
+    },
+    Artist: {
+        "name": Artist.name,
+        "city": Artist.city,
+        "state": Artist.state,
+        "phone": Artist.phone,
+        "image_link": Artist.image_link,
+        "facebook_link": Artist.facebook_link,
+        "website": Artist.website,
+        "seeking_venue": Artist.seeking_venue,
+        "seeking_description": Artist.seeking_description
+    },
+}
+
+def load_form_data(model, entity_id):
+    # one statement over the mapped columns only, never a full entity: the
+    # genres come back as one row each; None if there is no such row
+    association, entity_column = facets.ASSOCIATIONS[model]
+    columns = [column.label(name) for name, column in FORM_FIELDS[model].items()]
+    rows = db.session.query(model.id, *columns, Genre.name.label('genre')).outerjoin(
+        association, entity_column == model.id
+    ).outerjoin(
+        Genre, Genre.id == association.c.genre_id
+    ).filter(model.id == entity_id, model.deleted_at.is_(None)).order_by(Genre.name).all()
+    if not rows:
+        return None
+    return rows[0], [row.genre for row in rows if row.genre is not None]
+
+def populate_form(form, model, row, genres):
+    for name in FORM_FIELDS[model]:
+        getattr(form, name).data = getattr(row, name)
+    form.genres.data = genres
+
+def form_values(model, data):
+    # unchecked checkboxes are absent from a submission, everything else defaults to ''
+    values = {}
+    for name, column in FORM_FIELDS[model].items():
+        if isinstance(column.type, db.Boolean):
+            values[name] = bool(data.get(name, False))
+        else:
+            values[name] = data.get(name, "")
+    return values
+
+def apply_changes(model, entity_id, data):
+    # writes only the fields that differ from the stored row and returns their
+    # names; None if there is no such row. Nothing changed means no UPDATE
+    current = load_form_data(model, entity_id)
+    if current is None:
+        return None
+    row, genres = current
+    fields = FORM_FIELDS[model]
+    changed = {
+        name: value for name, value in form_values(model, data).items()
+        if not _same(getattr(row, name), value)
+    }
+    new_genres = facets.parse_genre_names(data.getlist("genres"))
+    if set(new_genres) != set(genres):
+        _replace_genres(model, entity_id, new_genres)
+        changed["genres"] = new_genres
+    if changed:
+        values = {fields[name]: value for name, value in changed.items() if name in fields}
+        values[model.updated_at] = datetime.utcnow()
+        db.session.query(model).filter(model.id == entity_id).update(values, synchronize_session=False)
+    return list(changed)
+
+def _replace_genres(model, entity_id, names):
+    association, entity_column = facets.ASSOCIATIONS[model]
+    genres = facets.get_or_create_genres(names)
+    db.session.flush()
+    db.session.execute(association.delete().where(entity_column == entity_id))
+    if genres:
+        db.session.execute(association.insert(), [
+            {entity_column.key: entity_id, "genre_id": genre.id} for genre in genres
+        ])
+
+def _same(stored, submitted):
+    # an empty field or unchecked box leaves a NULL column as it is
+    return stored == submitted or (stored is None and not submitted)
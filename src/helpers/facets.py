@@ -0,0 +1,85 @@
+from model import db, Genre, Venue, Artist, venue_genres, artist_genres
+from helpers import aio, deletion
+
+ASSOCIATIONS = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+FACETS = ('genre', 'city', 'state')
+
+def parse_genre_names(names):
+    # accepts a list from a multi-select or a legacy comma-joined string
+    if isinstance(names, str):
+        names = names.split(",")
+    parsed = []
+    for name in names or []:
+        name = name.strip()
+        if name and name not in parsed:
+            parsed.append(name)
+    return parsed
+
+def get_or_create_genres(names):
+    names = parse_genre_names(names)
+    if not names:
+        return []
+    existing = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names)).all()}
+    genres = []
+    for name in names:
+        genre = existing.get(name)
+        if genre is None:
+            genre = Genre(name=name)
+            db.session.add(genre)
+        genres.append(genre)
+    return genres
+
+def get_facet_filters(args):
+    return {facet: args.get(facet) for facet in FACETS if args.get(facet)}
+
+def filter_by_facets(query, model, genre=None, city=None, state=None):
+    # every listing and facet count goes through here, so soft-deleted rows drop out of all of them
+    query = query.filter(deletion.live(model))
+    if genre:
+        association, entity_column = ASSOCIATIONS[model]
+        genre_ids = db.session.query(entity_column).join(
+            Genre, Genre.id == association.c.genre_id
+        ).filter(Genre.name == genre)
+        query = query.filter(model.id.in_(genre_ids))
+    if city:
+        query = query.filter(model.city == city)
+    if state:
+        query = query.filter(model.state == state)
+    return query
+
+def get_facet_counts(model, **filters):
+    return format_facet_counts(facet_counts_query(model, **filters).all())
+
+async def get_facet_counts_async(model, **filters):
+    return format_facet_counts(await aio.fetch(facet_counts_query(model, **filters)))
+
+def facet_counts_query(model, **filters):
+    # one UNION ALL statement returns the counts for every facet
+    association, entity_column = ASSOCIATIONS[model]
+    ids = filter_by_facets(db.session.query(model.id), model, **filters)
+    genre_counts = db.session.query(
+        db.literal('genre').label('facet'),
+        Genre.name.label('value'),
+        db.func.count(entity_column).label('count')
+    ).select_from(association).join(
+        Genre, Genre.id == association.c.genre_id
+    ).filter(entity_column.in_(ids)).group_by(Genre.name)
+    city_counts = db.session.query(
+        db.literal('city'), model.city, db.func.count(model.id)
+    ).filter(model.id.in_(ids), model.city.isnot(None)).group_by(model.city)
+    state_counts = db.session.query(
+        db.literal('state'), model.state, db.func.count(model.id)
+    ).filter(model.id.in_(ids), model.state.isnot(None)).group_by(model.state)
+    return genre_counts.union_all(city_counts, state_counts)
+
+def format_facet_counts(rows):
+    facets = {facet: [] for facet in FACETS}
+    for row in rows:
+        facets[row[0]].append({"value": row[1], "count": row[2]})
+    for values in facets.values():
+        values.sort(key=lambda x: (-x["count"], x["value"]))
+    return facets
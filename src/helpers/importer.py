@@ -0,0 +1,287 @@
+import csv
+import json
+import os
+from datetime import timedelta
+from werkzeug.datastructures import MultiDict
+from model import db, Artist, Venue, Show, venue_genres, artist_genres, DEFAULT_SHOW_MINUTES
+from helpers import counters, facets, scheduling, search
+from helpers.cache import response_cache
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+VENUE_COLUMNS = ['name', 'city', 'state', 'address', 'phone', 'image_link',
+                 'facebook_link', 'website', 'seeking_talent', 'seeking_description']
+ARTIST_COLUMNS = ['name', 'city', 'state', 'phone', 'image_link',
+                  'facebook_link', 'website', 'seeking_venue', 'seeking_description']
+
+class ImportReport(object):
+    def __init__(self, kind, skipped=0):
+        self.kind = kind
+        self.skipped = skipped
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "skipped": self.skipped,
+            "read": self.read,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "batches": self.batches
+        }
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    elif fmt == 'ndjson':
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        raise ValueError('unsupported format: %s' % fmt)
+
+def guess_format(filename):
+    return 'ndjson' if filename.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+def import_stream(kind, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, checkpoint_path=None, rejects=None):
+    loader = LOADERS[kind]
+    skip = _read_checkpoint(checkpoint_path)
+    report = ImportReport(kind, skipped=skip)
+    batch = []
+    line = 0
+    for line, row in enumerate(read_rows(stream, fmt), 1):
+        if line <= skip:
+            continue
+        report.read += 1
+        values, errors = loader.validate(row)
+        if errors:
+            report.rejected += 1
+            _write_reject(rejects, line, row, errors)
+            continue
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            _flush(loader, batch, report, rejects, checkpoint_path, line)
+            batch = []
+    if batch:
+        _flush(loader, batch, report, rejects, checkpoint_path, line)
+    elif checkpoint_path and line > skip:
+        _write_checkpoint(checkpoint_path, line)
+    return report
+
+def import_file(kind, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, checkpoint_path=None, rejects_path=None):
+    fmt = fmt or guess_format(path)
+    rejects = open(rejects_path, 'a') if rejects_path else None
+    try:
+        with open(path, newline='') as stream:
+            return import_stream(kind, stream, fmt, batch_size, checkpoint_path, rejects)
+    finally:
+        if rejects:
+            rejects.close()
+
+def _flush(loader, batch, report, rejects, checkpoint_path, line):
+    try:
+        inserted, skipped, on_commit = loader.insert(batch)
+        db.session.commit()
+        on_commit()
+    except Exception as e:
+        db.session.rollback()
+        inserted = 0
+        skipped = [(row_line, values, {"batch": [str(e)]}) for row_line, values in batch]
+    for row_line, values, errors in skipped:
+        _write_reject(rejects, row_line, values, errors)
+    report.rejected += len(skipped)
+    report.inserted += inserted
+    report.batches += 1
+    # the checkpoint only moves once the batch is committed (or rejected),
+    # so a crashed import resumes from the first uncommitted row
+    if checkpoint_path:
+        _write_checkpoint(checkpoint_path, line)
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f).get("line", 0)
+
+def _write_checkpoint(path, line):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({"line": line}, f)
+    os.replace(tmp_path, path)
+
+def _write_reject(rejects, line, row, errors):
+    if rejects is not None:
+        rejects.write(json.dumps({"line": line, "row": row, "errors": errors}, default=str) + '\n')
+
+def _validate_form(form_name, row):
+    # forms (and wtforms behind it) load on the first import, not at app startup
+    import forms
+    formdata = MultiDict()
+    for key, value in row.items():
+        if key == 'genres':
+            for genre in facets.parse_genre_names(value):
+                formdata.add(key, genre)
+        elif value is not None:
+            formdata.add(key, value if isinstance(value, str) else str(value))
+    form = getattr(forms, form_name)(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    return form.data, None
+
+class _EntityLoader(object):
+    def __init__(self, model, form_name, columns, association, entity_column, tag):
+        self.model = model
+        self.form_name = form_name
+        self.columns = columns
+        self.association = association
+        self.entity_column = entity_column
+        self.tag = tag
+
+    def validate(self, row):
+        data, errors = _validate_form(self.form_name, row)
+        if errors:
+            return None, errors
+        values = {column: data[column] for column in self.columns}
+        values["genres"] = data["genres"]
+        return values, None
+
+    def insert(self, batch):
+        rows = [values for _, values in batch]
+        ids = _allocate_ids(self.model, len(rows))
+        genre_ids = _get_genre_ids(set(name for row in rows for name in row["genres"]))
+        entities = []
+        links = []
+        for entity_id, row in zip(ids, rows):
+            entity = {column: row[column] for column in self.columns}
+            entity["id"] = entity_id
+            entities.append(entity)
+            for name in row["genres"]:
+                links.append({self.entity_column: entity_id, "genre_id": genre_ids[name]})
+        db.session.execute(self.model.__table__.insert(), entities)
+        if links:
+            db.session.execute(self.association.insert(), links)
+
+        def on_commit():
+            for entity in entities:
+                search.index_entity(self.model, entity["id"], entity["name"])
+            response_cache.invalidate(self.tag)
+        return len(entities), [], on_commit
+
+class _ShowLoader(object):
+    def validate(self, row):
+        if not row.get("start_time"):
+            # ShowForm would fall back to its default of today
+            return None, {"start_time": ["This field is required."]}
+        data, errors = _validate_form('ShowForm', row)
+        if errors:
+            return None, errors
+        try:
+            values = {
+                "venue_id": int(data["venue_id"]),
+                "artist_id": int(data["artist_id"]),
+                "start_time": data["start_time"],
+                "end_time": data["start_time"] + timedelta(minutes=data["duration_minutes"] or DEFAULT_SHOW_MINUTES)
+            }
+        except (TypeError, ValueError):
+            return None, {"id": ["venue_id and artist_id must be integers"]}
+        return values, None
+
+    def insert(self, batch):
+        # one existence check per batch instead of one per row
+        venue_ids = set(values["venue_id"] for _, values in batch)
+        artist_ids = set(values["artist_id"] for _, values in batch)
+        known_venues = set(id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids), Venue.deleted_at.is_(None)))
+        known_artists = set(id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids), Artist.deleted_at.is_(None)))
+        # existing bookings and the batch's own accepted rows, checked in memory
+        bookings = scheduling.load_conflict_index(
+            venue_ids, artist_ids,
+            min(values["start_time"] for _, values in batch),
+            max(values["end_time"] for _, values in batch)
+        )
+        seen = set()
+        shows = []
+        skipped = []
+        inserted = 0
+        for line, values in batch:
+            key = (values["venue_id"], values["artist_id"], values["start_time"])
+            if values["venue_id"] not in known_venues:
+                skipped.append((line, values, {"venue_id": ["unknown venue"]}))
+            elif values["artist_id"] not in known_artists:
+                skipped.append((line, values, {"artist_id": ["unknown artist"]}))
+            elif key in seen:
+                skipped.append((line, values, {"start_time": ["duplicate show in batch"]}))
+            else:
+                conflict = bookings.conflict(values["venue_id"], values["artist_id"], values["start_time"], values["end_time"])
+                if conflict:
+                    skipped.append((line, values, {"start_time": ["%s is already booked at this time" % conflict]}))
+                    continue
+                seen.add(key)
+                bookings.add(values["venue_id"], values["artist_id"], values["start_time"], values["end_time"])
+                shows.append(values)
+        if shows:
+            # rows already in the table are left alone rather than failing the batch,
+            # so only the rowcount tells how many went in
+            result = db.session.execute(_insert_ignoring_duplicates(Show.__table__), shows)
+            inserted = result.rowcount if result.rowcount >= 0 else len(shows)
+            # ignored duplicates make increments unreliable; recount the batch's rows instead
+            counters.refresh(Venue, set(show["venue_id"] for show in shows))
+            counters.refresh(Artist, set(show["artist_id"] for show in shows))
+
+        def on_commit():
+            if shows:
+                response_cache.invalidate('shows', 'venues', *(
+                    ['venue:%d' % id for id in known_venues] + ['artist:%d' % id for id in known_artists]
+                ))
+        return inserted, skipped, on_commit
+
+def _insert_ignoring_duplicates(table):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+def _allocate_ids(model, count):
+    if db.engine.dialect.name == 'postgresql':
+        sequence = '"%s_id_seq"' % model.__tablename__
+        rows = db.session.execute(
+            db.text("SELECT nextval('%s') FROM generate_series(1, :count)" % sequence),
+            {"count": count}
+        )
+        return [row[0] for row in rows]
+    if db.engine.dialect.name == 'sqlite':
+        # without sequences, hold the database's write lock from reading
+        # max(id) until the batch commits, so web creates running alongside
+        # the import wait instead of taking the same ids
+        _begin_immediate()
+    start = (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+    return list(range(start, start + count))
+
+def _begin_immediate():
+    connection = db.session.connection()
+    # pysqlite only opens a transaction on the first write, and once it has
+    # one the write lock is already held
+    if not connection.connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def _get_genre_ids(names):
+    if not names:
+        return {}
+    genres = facets.get_or_create_genres(sorted(names))
+    db.session.flush()
+    return {genre.name: genre.id for genre in genres}
+
+LOADERS = {
+    'venues': _EntityLoader(Venue, 'VenueForm', VENUE_COLUMNS, venue_genres, 'venue_id', 'venues'),
+    'artists': _EntityLoader(Artist, 'ArtistForm', ARTIST_COLUMNS, artist_genres, 'artist_id', 'artists'),
+    'shows': _ShowLoader(),
+}
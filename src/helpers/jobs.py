@@ -0,0 +1,248 @@
+import json
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from model import db, Job
+from helpers import helper
+
+# Follow-up work that does not have to finish before the response. enqueue
+# writes a row to the jobs table in the caller's transaction, so a job exists
+# exactly when the write it follows up is committed, and it survives restarts.
+# Worker threads claim due rows, run the registered task and delete the row.
+# A failed task is retried with exponential backoff; after MAX_ATTEMPTS the
+# row stays behind as failed. A claimed row is leased, and the lease is
+# renewed while the task runs: if its worker dies, the job is due again once
+# the lease runs out, so tasks must be idempotent.
+QUEUED = 'queued'
+RUNNING = 'running'
+FAILED = 'failed'
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 2
+MAX_BACKOFF_SECONDS = 600
+LEASE_SECONDS = 300
+# a running job's lease is extended this often, well before it runs out
+RENEW_SECONDS = LEASE_SECONDS / 3.0
+# besides being woken by commits, idle workers look for retries and expired leases this often
+POLL_SECONDS = 30
+CLAIM_BATCH = 10
+
+TASKS = {}
+
+def task(name):
+    def decorator(function):
+        TASKS[name] = function
+        return function
+    return decorator
+
+def enqueue(name, delay=0, **payload):
+    # payload must be JSON-serializable; the caller commits
+    if name not in TASKS:
+        raise KeyError('unknown job: %s' % name)
+    now = datetime.utcnow()
+    db.session.execute(Job.__table__.insert().values(
+        name=name,
+        payload=json.dumps(payload),
+        state=QUEUED,
+        attempts=0,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now
+    ))
+    db.session.info['jobs_enqueued'] = True
+
+def run_pending(limit=None):
+    # runs due jobs until none are left, or limit have run; returns how many ran
+    ran = 0
+    while limit is None or ran < limit:
+        claimed = _claim()
+        if claimed is None:
+            break
+        _run(*claimed)
+        ran += 1
+    return ran
+
+def get_depth():
+    # {state: (count, oldest run_at)}
+    rows = db.session.query(Job.state, db.func.count(Job.id), db.func.min(Job.run_at)).group_by(Job.state)
+    return {state: (count, helper.as_datetime(oldest)) for state, count, oldest in rows}
+
+def backoff(attempts):
+    # 2s, 4s, 8s, ... up to MAX_BACKOFF_SECONDS, jittered so retries of a burst spread out
+    return min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+def _claim():
+    # optimistic: the UPDATE only matches if no other worker claimed the row
+    # since it was read, which works the same on every database
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    candidates = db.session.query(Job.id, Job.name, Job.payload, Job.state, Job.run_at, Job.attempts).filter(
+        Job.state.in_([QUEUED, RUNNING]), Job.run_at <= now
+    ).order_by(Job.run_at).limit(CLAIM_BATCH).all()
+    for candidate in candidates:
+        claimed = db.session.query(Job).filter(
+            Job.id == candidate.id, Job.state == candidate.state, Job.run_at == candidate.run_at
+        ).update({
+            Job.state: RUNNING,
+            Job.run_at: lease_until,
+            Job.attempts: Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            if candidate.state == RUNNING:
+                worker.events['reclaimed', candidate.name] += 1
+            return candidate, lease_until
+    db.session.commit()
+    return None
+
+def _run(job, lease_until):
+    attempts = job.attempts + 1
+    try:
+        with Lease(db.engine, job.id, lease_until):
+            TASKS[job.name](**json.loads(job.payload))
+        db.session.query(Job).filter(Job.id == job.id).delete(synchronize_session=False)
+        db.session.commit()
+        worker.events['succeeded', job.name] += 1
+    except Exception as e:
+        db.session.rollback()
+        if attempts >= MAX_ATTEMPTS:
+            values = {Job.state: FAILED, Job.last_error: repr(e)}
+            worker.events['failed', job.name] += 1
+        else:
+            values = {
+                Job.state: QUEUED,
+                Job.run_at: datetime.utcnow() + timedelta(seconds=backoff(attempts)),
+                Job.last_error: repr(e)
+            }
+            worker.events['retried', job.name] += 1
+        db.session.query(Job).filter(Job.id == job.id).update(values, synchronize_session=False)
+        db.session.commit()
+        worker.log_failure(job, attempts)
+
+class Lease(object):
+    # renews a claimed job's lease from a side thread, on its own connection,
+    # while the task runs in the worker's session; a long purge is then never
+    # reclaimed and run a second time by another worker
+    def __init__(self, engine, job_id, lease_until):
+        self.engine = engine
+        self.job_id = job_id
+        self.lease_until = lease_until
+        self._stop = threading.Event()
+        # named like the workers, so benchmarks.QueryCounter leaves it out too
+        self._thread = threading.Thread(target=self._renew, name='fyyur-jobs-lease-%d' % job_id, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _renew(self):
+        while not self._stop.wait(RENEW_SECONDS):
+            lease_until = datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)
+            try:
+                with self.engine.begin() as connection:
+                    # matching the current lease, so a job reclaimed after all is left alone
+                    renewed = connection.execute(Job.__table__.update().where(
+                        Job.id == self.job_id, Job.state == RUNNING, Job.run_at == self.lease_until
+                    ).values(run_at=lease_until)).rowcount
+            except Exception:
+                # e.g. sqlite busy while the task writes; try again next round
+                if worker.app is not None:
+                    worker.app.logger.warning('could not renew the lease of job %d', self.job_id, exc_info=True)
+                continue
+            if not renewed:
+                return
+            self.lease_until = lease_until
+
+class JobWorker(object):
+    # a few daemon threads per process, started by the first commit that
+    # enqueues a job, so processes that never write never poll
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self.app = None
+        self.size = 0
+        self.depth = {}
+        self.events = Counter()
+
+    def init_app(self, app):
+        self.app = app
+        self.size = app.config['JOBS_WORKERS']
+
+    def wake(self):
+        with self._lock:
+            while self.app is not None and len(self._threads) < self.size:
+                thread = threading.Thread(target=self._run, name='fyyur-jobs-%d' % len(self._threads), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._wake.set()
+
+    def run_forever(self, poll_seconds):
+        # the flask run-jobs worker process
+        while True:
+            self.run_once()
+            self._wait(poll_seconds)
+
+    def run_once(self):
+        try:
+            run_pending()
+            self.depth = get_depth()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('job worker pass failed')
+        finally:
+            db.session.remove()
+
+    def log_failure(self, job, attempts):
+        give_up = attempts >= MAX_ATTEMPTS
+        self.app.logger.warning('job %s %d failed (attempt %d of %d)%s', job.name, job.id, attempts, MAX_ATTEMPTS,
+                                ', giving up' if give_up else '', exc_info=True)
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                self.run_once()
+            self._wait(POLL_SECONDS)
+
+    def _wait(self, poll_seconds):
+        # until woken, the next retry falls due, or poll_seconds pass
+        timeout = poll_seconds
+        count, oldest = self.depth.get(QUEUED, (0, None))
+        if count and oldest is not None:
+            timeout = max(0.0, min(timeout, (oldest - datetime.utcnow()).total_seconds()))
+        self._wake.wait(timeout)
+        self._wake.clear()
+
+    def depth_stats(self):
+        return {(('state', state),): self.depth.get(state, (0, None))[0] for state in (QUEUED, RUNNING, FAILED)}
+
+    def lag_stats(self):
+        # how long the oldest due job has been waiting; 0 when nothing is due
+        count, oldest = self.depth.get(QUEUED, (0, None))
+        if not count or oldest is None:
+            return {(): 0}
+        return {(): round(max(0.0, (datetime.utcnow() - oldest).total_seconds()), 3)}
+
+    def event_stats(self):
+        return {(('outcome', outcome), ('job', name)): count for (outcome, name), count in self.events.items()}
+
+worker = JobWorker()
+
+def _after_commit(session):
+    if session.info.pop('jobs_enqueued', False):
+        worker.wake()
+
+def _after_rollback(session):
+    session.info.pop('jobs_enqueued', None)
+
+def init_app(app):
+    app.config.setdefault('JOBS_WORKERS', 2)
+    worker.init_app(app)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
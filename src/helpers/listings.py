@@ -0,0 +1,18 @@
+from model import db, Artist, Venue, Show
+from helpers import facets
+
+def listings_query(columns, start_time, end_time, city=None, state=None, genre=None):
+    # shows starting in [start_time, end_time); city and state are the venue's,
+    # genre the artist's. Ordered by (start_time, venue_id, artist_id), the
+    # window walks ix_shows_start_time_venue_id_artist_id in index order, and a
+    # selective city can start from ix_Venue_city_state instead
+    query = db.session.query(*columns).select_from(Show).join(
+        Venue, Venue.id == Show.venue_id
+    ).join(
+        Artist, Artist.id == Show.artist_id
+    ).filter(
+        Show.start_time >= start_time,
+        Show.start_time < end_time
+    )
+    query = facets.filter_by_facets(query, Venue, city=city, state=state)
+    return facets.filter_by_facets(query, Artist, genre=genre)
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import Counter
+from flask import Response, current_app, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class Histogram(object):
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [
+            '# HELP %s %s' % (self.name, self.documentation),
+            '# TYPE %s histogram' % self.name
+        ]
+        for labels, (bucket_counts, total, count) in sorted(self._series.items()):
+            label_text = _format_labels(labels)
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append('%s_bucket{%s,le="%s"} %d' % (self.name, label_text, bound, bucket_count))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (self.name, label_text, count))
+            lines.append('%s_sum{%s} %f' % (self.name, label_text, total))
+            lines.append('%s_count{%s} %d' % (self.name, label_text, count))
+        return lines
+
+class CounterMetric(object):
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = Counter()
+
+    def inc(self, labels, amount=1):
+        self._values[labels] += amount
+
+    def render(self):
+        lines = [
+            '# HELP %s %s' % (self.name, self.documentation),
+            '# TYPE %s counter' % self.name
+        ]
+        for labels, value in sorted(self._values.items()):
+            lines.append('%s{%s} %d' % (self.name, _format_labels(labels), value))
+        return lines
+
+class Registry(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = CounterMetric('fyyur_requests_total', 'Requests served.')
+        self.latency = Histogram('fyyur_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS)
+        self.db_time = Histogram('fyyur_request_db_seconds', 'Time spent in SQL per request.', LATENCY_BUCKETS)
+        self.render_time = Histogram('fyyur_request_render_seconds', 'Template render time per request.', LATENCY_BUCKETS)
+        self.template_time = Histogram('fyyur_template_render_seconds', 'Render time by top-level template.', LATENCY_BUCKETS)
+        self.statements = Histogram('fyyur_request_sql_statements', 'SQL statements issued per request.', COUNT_BUCKETS)
+        self.n_plus_one = CounterMetric('fyyur_n_plus_one_total', 'Requests repeating an identical SQL statement.')
+        self.collectors = []
+
+    def record(self, endpoint, method, status, stats):
+        labels = (('endpoint', endpoint), ('method', method))
+        with self._lock:
+            self.requests.inc(labels + (('status', str(status)),))
+            self.latency.observe(labels, stats.total)
+            self.db_time.observe(labels, stats.sql_time)
+            self.render_time.observe(labels, stats.render_time)
+            self.statements.observe(labels, stats.sql_count)
+
+    def record_render(self, template, seconds):
+        with self._lock:
+            self.template_time.observe((('template', template),), seconds)
+
+    def record_n_plus_one(self, endpoint):
+        with self._lock:
+            self.n_plus_one.inc((('endpoint', endpoint),))
+
+    def add_collector(self, name, documentation, metric_type, collect):
+        # collect() returns {labels tuple: value} and is called at scrape time;
+        # a collector added again under its name replaces the earlier one
+        self.collectors = [collector for collector in self.collectors if collector[0] != name]
+        self.collectors.append((name, documentation, metric_type, collect))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in (self.requests, self.latency, self.db_time, self.render_time, self.template_time, self.statements, self.n_plus_one):
+                lines.extend(metric.render())
+        for name, documentation, metric_type, collect in self.collectors:
+            lines.append('# HELP %s %s' % (name, documentation))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+            for labels, value in sorted(collect().items()):
+                lines.append('%s{%s} %s' % (name, _format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+class RequestStats(object):
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self._query_start = None
+        self._render_start = None
+
+registry = Registry()
+_engine_hooked = False
+
+def init_app(app):
+    global _engine_hooked
+    app.config.setdefault('METRICS_N_PLUS_ONE_THRESHOLD', 5)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_finish_render, app)
+    if not _engine_hooked:
+        # Engine-level listeners see every connection, whichever session issued it
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _engine_hooked = True
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+def metrics_view():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def current_stats():
+    if has_request_context():
+        return g.get('request_stats')
+    return None
+
+def _start_request():
+    g.request_stats = RequestStats()
+
+def _finish_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    stats.total = time.perf_counter() - stats.start
+    endpoint = request.endpoint or 'unknown'
+    registry.record(endpoint, request.method, response.status_code, stats)
+    _check_n_plus_one(endpoint, stats)
+    return response
+
+def _check_n_plus_one(endpoint, stats):
+    threshold = current_app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+    repeated = [(statement, count) for statement, count in stats.statements.items() if count >= threshold]
+    if repeated:
+        registry.record_n_plus_one(endpoint)
+        for statement, count in repeated:
+            current_app.logger.warning(
+                'possible N+1 in %s: statement ran %d times: %s', endpoint, count, ' '.join(statement.split())[:300]
+            )
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    if stats is not None:
+        stats._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    if stats is not None and stats._query_start is not None:
+        stats.sql_time += time.perf_counter() - stats._query_start
+        stats.sql_count += 1
+        stats.statements[statement] += 1
+        stats._query_start = None
+
+def _start_render(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is not None:
+        stats._render_start = time.perf_counter()
+
+def _finish_render(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is not None and stats._render_start is not None:
+        elapsed = time.perf_counter() - stats._render_start
+        stats.render_time += elapsed
+        stats._render_start = None
+        # included templates render inside their parent and are counted there
+        registry.record_render(template.name or 'unknown', elapsed)
+
+def pool_stats(pool):
+    # QueuePool reports its usage; sqlite's pools expose none of this
+    stats = {}
+    for state, method in (('size', 'size'), ('checked_out', 'checkedout'), ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+        if hasattr(pool, method):
+            stats[(('state', state),)] = getattr(pool, method)()
+    return stats
+
+def _format_labels(labels):
+    return ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels)
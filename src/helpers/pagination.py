@@ -0,0 +1,64 @@
+import base64
+import json
+from datetime import datetime
+from model import db
+from helpers import aio
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(page_size, maximum))
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, parsers):
+    # raises ValueError on anything that is not a cursor we produced
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (TypeError, UnicodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError('invalid cursor') from e
+    if not isinstance(values, list) or len(values) != len(parsers):
+        raise ValueError('invalid cursor')
+    try:
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (TypeError, ValueError) as e:
+        raise ValueError('invalid cursor') from e
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value)
+
+def keyset_page(query, key_columns, cursor_values=None, page_size=DEFAULT_PAGE_SIZE):
+    rows = keyset_query(query, key_columns, cursor_values, page_size).all()
+    return split_page(rows, key_columns, page_size)
+
+async def keyset_page_async(query, key_columns, cursor_values=None, page_size=DEFAULT_PAGE_SIZE):
+    rows = await aio.fetch(keyset_query(query, key_columns, cursor_values, page_size))
+    return split_page(rows, key_columns, page_size)
+
+def keyset_query(query, key_columns, cursor_values=None, page_size=DEFAULT_PAGE_SIZE):
+    # key_columns must be unique together, e.g. a composite primary key
+    if cursor_values is not None:
+        bound = [db.literal(value, type_=column.type) for column, value in zip(key_columns, cursor_values)]
+        query = query.filter(db.tuple_(*key_columns) > db.tuple_(*bound))
+    # one row past the page tells whether there is a next page
+    return query.order_by(*key_columns).limit(page_size + 1)
+
+def split_page(rows, key_columns, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in key_columns])
+    return rows, next_cursor
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
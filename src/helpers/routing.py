@@ -0,0 +1,99 @@
+import random
+import time
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+import config
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+class RoutingSession(SignallingSession):
+    # reads go to a replica only when the current request was routed there
+    # and the session has nothing of its own to write
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            has_request_context()
+            and g.get('db_route') == REPLICA
+            and not self._flushing
+            and not (self.new or self.dirty or self.deleted)
+        ):
+            engine = self.db.get_replica_engine(self.app)
+            if engine is not None:
+                return engine
+        return SignallingSession.get_bind(self, mapper, clause, **kwargs)
+
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def __init__(self, *args, **kwargs):
+        self._replica_engines = {}
+        SQLAlchemy.__init__(self, *args, **kwargs)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        if engine.dialect.name == 'sqlite':
+            # sqlite only honours ON DELETE CASCADE on connections that ask for it
+            event.listen(engine, 'connect', _enable_foreign_keys)
+        return engine
+
+    def get_replica_engine(self, app):
+        uris = app.config.get('SQLALCHEMY_REPLICA_URIS')
+        if not uris:
+            return None
+        engines = self._replica_engines.get(app)
+        if engines is None:
+            engines = self._replica_engines[app] = [
+                create_engine(uri, **config.engine_options(
+                    uri,
+                    app.config['DB_POOL_SIZE'],
+                    app.config['DB_MAX_OVERFLOW'],
+                    app.config['DB_POOL_RECYCLE'],
+                    app.config['DB_POOL_TIMEOUT'],
+                    app.config['DB_STATEMENT_TIMEOUT_MS']
+                )) for uri in uris
+            ]
+        return random.choice(engines)
+
+def _enable_foreign_keys(connection, record):
+    cursor = connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+def read_only(view):
+    # marks a non-GET view (e.g. a POST search) as safe to serve from a replica
+    view.replica_ok = True
+    return view
+
+def init_app(app):
+    app.config.setdefault('DB_PRIMARY_PIN_SECONDS', 5)
+    app.before_request(_choose_route)
+    app.after_request(_pin_after_write)
+
+def _choose_route():
+    g.db_route = PRIMARY
+    if not current_app.config.get('SQLALCHEMY_REPLICA_URIS'):
+        return
+    if time.time() < session.get('primary_until', 0):
+        # this client wrote recently; replicas may not have its change yet
+        return
+    if request.method in ('GET', 'HEAD') or _replica_ok():
+        g.db_route = REPLICA
+
+def _pin_after_write(response):
+    if (
+        current_app.config.get('SQLALCHEMY_REPLICA_URIS')
+        and request.method not in ('GET', 'HEAD')
+        and not _replica_ok()
+    ):
+        session['primary_until'] = time.time() + current_app.config['DB_PRIMARY_PIN_SECONDS']
+    return response
+
+def _replica_ok():
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, 'replica_ok', False)
@@ -0,0 +1,210 @@
+import bisect
+from datetime import datetime, timedelta
+from model import db, Artist, Venue, Show, MAX_SHOW_MINUTES
+from helpers import jobs, deletion
+
+MAX_SHOW_DURATION = timedelta(minutes=MAX_SHOW_MINUTES)
+
+RECURRENCE_STEPS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+# a daily show for a year
+MAX_OCCURRENCES = 366
+
+class ShowConflict(Exception):
+    def __init__(self, kind, entity_id, start_time, end_time):
+        Exception.__init__(self, '%s %d is already booked from %s to %s' % (
+            kind.capitalize(), entity_id, start_time, end_time))
+        self.kind = kind
+        self.entity_id = entity_id
+        self.start_time = start_time
+        self.end_time = end_time
+
+class IntervalSet(object):
+    # booked [start, end) time for one venue or artist, kept as sorted,
+    # disjoint intervals: overlapping bookings merge on add, so checking a
+    # new one is a single bisect
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def overlaps(self, start, end):
+        i = bisect.bisect_left(self.starts, end)
+        return i > 0 and self.ends[i - 1] > start
+
+    def add(self, start, end):
+        lo = bisect.bisect_left(self.ends, start)
+        hi = bisect.bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def gaps(self, start, end, min_length=timedelta(0)):
+        free = []
+        cursor = start
+        for i in range(bisect.bisect_right(self.ends, start), len(self.starts)):
+            if self.starts[i] >= end:
+                break
+            if self.starts[i] > cursor and self.starts[i] - cursor >= min_length:
+                free.append((cursor, self.starts[i]))
+            cursor = max(cursor, self.ends[i])
+        if end > cursor and end - cursor >= min_length:
+            free.append((cursor, end))
+        return free
+
+class ConflictIndex(object):
+    # in-memory check for bulk imports: one IntervalSet per venue and per artist
+    def __init__(self):
+        self._sets = {}
+
+    def add(self, venue_id, artist_id, start_time, end_time):
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            self._sets.setdefault(key, IntervalSet()).add(start_time, end_time)
+
+    def conflict(self, venue_id, artist_id, start_time, end_time):
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            intervals = self._sets.get(key)
+            if intervals is not None and intervals.overlaps(start_time, end_time):
+                return key[0]
+        return None
+
+class BookingReport(object):
+    def __init__(self, venue_id, artist_id):
+        self.venue_id = venue_id
+        self.artist_id = artist_id
+        self.occurrences = []
+
+    def add(self, start_time, end_time, status, reason=None):
+        occurrence = {"start_time": start_time, "end_time": end_time, "status": status}
+        if reason:
+            occurrence["reason"] = reason
+        self.occurrences.append(occurrence)
+
+    def count(self, status):
+        return sum(1 for occurrence in self.occurrences if occurrence["status"] == status)
+
+    def to_dict(self):
+        return {
+            "venue_id": self.venue_id,
+            "artist_id": self.artist_id,
+            "created": self.count('created'),
+            "duplicates": self.count('duplicate'),
+            "conflicts": self.count('conflict'),
+            "occurrences": self.occurrences
+        }
+
+def expand_recurrence(start_time, frequency, interval=1, count=None, until=None):
+    # naive local times, so "every Friday 9pm" stays at 9pm across DST changes;
+    # a date-only until includes that whole day
+    if frequency not in RECURRENCE_STEPS:
+        raise ValueError('frequency must be one of: ' + ', '.join(sorted(RECURRENCE_STEPS)))
+    if interval < 1:
+        raise ValueError('interval must be at least 1')
+    if (count is None) == (until is None):
+        raise ValueError('give either count or until')
+    if not isinstance(until, datetime) and until is not None:
+        until = datetime.combine(until, datetime.max.time())
+    step = RECURRENCE_STEPS[frequency] * interval
+    occurrences = []
+    start = start_time
+    while (count is None or len(occurrences) < count) and (until is None or start <= until):
+        if len(occurrences) == MAX_OCCURRENCES:
+            raise ValueError('a schedule can have at most %d occurrences' % MAX_OCCURRENCES)
+        occurrences.append(start)
+        start += step
+    return occurrences
+
+def book_shows(venue_id, artist_id, start_times, duration):
+    # books one venue/artist pair at every start time in a single multi-row
+    # INSERT. Start times already booked for the pair (the shows primary key)
+    # are reported as duplicates, ones overlapping another booking of the venue
+    # or the artist as conflicts; the rest are created. The caller commits.
+    check_exists(venue_id, artist_id)
+    report = BookingReport(venue_id, artist_id)
+    if not start_times:
+        return report
+    window_start = min(start_times)
+    window_end = max(start_times) + duration
+    booked = set(start for start, in db.session.query(Show.start_time).filter(
+        Show.venue_id == venue_id,
+        Show.artist_id == artist_id,
+        Show.start_time >= window_start,
+        Show.start_time <= window_end
+    ))
+    bookings = load_conflict_index([venue_id], [artist_id], window_start, window_end)
+    requested = set()
+    shows = []
+    for start_time in sorted(start_times):
+        end_time = start_time + duration
+        if start_time in booked:
+            report.add(start_time, end_time, 'duplicate', 'this show is already listed')
+            continue
+        if start_time in requested:
+            report.add(start_time, end_time, 'duplicate', 'listed twice in this batch')
+            continue
+        requested.add(start_time)
+        conflict = bookings.conflict(venue_id, artist_id, start_time, end_time)
+        if conflict:
+            report.add(start_time, end_time, 'conflict', '%s is already booked at this time' % conflict)
+            continue
+        bookings.add(venue_id, artist_id, start_time, end_time)
+        shows.append({"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time, "end_time": end_time})
+        report.add(start_time, end_time, 'created')
+    if shows:
+        db.session.execute(Show.__table__.insert().values(shows))
+        jobs.enqueue('refresh-counters', venue_ids=[venue_id], artist_ids=[artist_id])
+    return report
+
+def check_conflicts(venue_id, artist_id, start_time, end_time):
+    # a show that overlaps [start_time, end_time) must start less than
+    # MAX_SHOW_DURATION before it, which bounds both lookups to a short range
+    # of the (venue_id, start_time) and (artist_id, start_time) indexes
+    for kind, column, entity_id in (('venue', Show.venue_id, venue_id), ('artist', Show.artist_id, artist_id)):
+        row = _overlapping(db.session.query(Show.start_time, Show.end_time), start_time, end_time).filter(
+            column == entity_id
+        ).first()
+        if row is not None:
+            raise ShowConflict(kind, entity_id, row.start_time, row.end_time)
+
+def load_conflict_index(venue_ids, artist_ids, start_time, end_time):
+    # every booked show of these venues and artists that could overlap [start_time, end_time)
+    index = ConflictIndex()
+    rows = _overlapping(db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time), start_time, end_time).filter(
+        db.or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids))
+    )
+    for row in rows:
+        index.add(row.venue_id, row.artist_id, row.start_time, row.end_time)
+    return index
+
+def get_free_slots(venue_id, start_time, end_time, min_length=timedelta(0)):
+    booked = IntervalSet()
+    rows = _overlapping(db.session.query(Show.start_time, Show.end_time), start_time, end_time).filter(
+        Show.venue_id == venue_id
+    ).order_by(Show.start_time)
+    for row in rows:
+        booked.add(row.start_time, row.end_time)
+    return booked.gaps(start_time, end_time, min_length)
+
+def check_exists(venue_id, artist_id):
+    # both ids in one round trip; a soft-deleted venue or artist takes no new shows
+    venue, artist = db.session.query(
+        db.exists().where(Venue.id == venue_id, Venue.deleted_at.is_(None)),
+        db.exists().where(Artist.id == artist_id, Artist.deleted_at.is_(None))
+    ).one()
+    if not venue:
+        raise LookupError('venue %d does not exist' % venue_id)
+    if not artist:
+        raise LookupError('artist %d does not exist' % artist_id)
+
+def _overlapping(query, start_time, end_time):
+    # shows of a soft-deleted venue or artist are on their way out and block nothing
+    return query.filter(
+        Show.start_time > start_time - MAX_SHOW_DURATION,
+        Show.start_time < end_time,
+        Show.end_time > start_time,
+        Show.venue_id.notin_(deletion.deleted_ids(Venue)),
+        Show.artist_id.notin_(deletion.deleted_ids(Artist))
+    )
@@ -0,0 +1,272 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from model import db
+from helpers import aio, helper
+
+DEFAULT_LIMIT = 50
+
+class PostgresSearchBackend(object):
+    # relies on the pg_trgm / tsvector GIN indexes from the search migration:
+    # ILIKE '%term%' is answered from the trigram index instead of a sequential scan
+    def search(self, model, term, limit):
+        return self._format(self.query(model, term, limit).all())
+
+    async def search_async(self, model, term, limit):
+        return self._format(await aio.fetch(self.query(model, term, limit)))
+
+    def query(self, model, term, limit):
+        similarity = db.func.similarity(model.name, term)
+        text_rank = db.func.ts_rank(
+            db.func.to_tsvector('simple', model.name),
+            db.func.plainto_tsquery('simple', term)
+        )
+        return db.session.query(
+            model.id,
+            model.name,
+            db.func.count().over().label('total')
+        ).filter(
+            model.name.ilike('%' + _escape_like(term) + '%', escape='\\'),
+            model.deleted_at.is_(None)
+        ).order_by(
+            (similarity + text_rank).desc(), model.name
+        ).limit(limit)
+
+    def _format(self, rows):
+        total = rows[0].total if rows else 0
+        return [(row.id, row.name) for row in rows], total
+
+    def add(self, model, entity_id, name):
+        pass
+
+    def remove(self, model, entity_id):
+        pass
+
+class NgramSearchBackend(object):
+    # Each process keeps its own index. Writes made here reach it through
+    # add/remove; writes made elsewhere (other workers, imports and snapshot
+    # restores from the CLI) are caught by checking the table at most every
+    # SYNC_SECONDS: rows whose updated_at moved past the index's high-water
+    # mark are re-read, and if the live rows still do not match what the
+    # index holds (hard deletes, a restore) the index is rebuilt.
+    SYNC_SECONDS = 5
+    # a row can commit a little after its updated_at was stamped
+    SYNC_MARGIN = timedelta(seconds=5)
+
+    def __init__(self, n=3):
+        self.n = n
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def search(self, model, term, limit):
+        index = self._get_index(model)
+        with self._lock:
+            return index.search(term, limit)
+
+    async def search_async(self, model, term, limit):
+        index = self._indexes.get(model.__tablename__)
+        if index is None:
+            # only the first search of a model reads the whole table
+            state = await aio.fetch_one(self._state_query(model))
+            index = self._build_index(model, await aio.fetch(self._names_query(model)), state)
+        elif self._sync_due(index):
+            state = await aio.fetch_one(self._state_query(model))
+            changed = await aio.fetch(self._changed_query(model, index)) if self._has_changes(index, state) else []
+            if not self._apply_changes(index, state, changed):
+                self._drop_index(model, index)
+                state = await aio.fetch_one(self._state_query(model))
+                index = self._build_index(model, await aio.fetch(self._names_query(model)), state)
+        with self._lock:
+            return index.search(term, limit)
+
+    def add(self, model, entity_id, name):
+        index = self._indexes.get(model.__tablename__)
+        if index is not None:
+            with self._lock:
+                index.add(entity_id, name)
+
+    def remove(self, model, entity_id):
+        index = self._indexes.get(model.__tablename__)
+        if index is not None:
+            with self._lock:
+                index.remove(entity_id)
+
+    def _get_index(self, model):
+        index = self._indexes.get(model.__tablename__)
+        if index is None:
+            index = self._build_index(model, self._names_query(model).all(), self._state_query(model).one())
+        elif self._sync_due(index):
+            state = self._state_query(model).one()
+            changed = self._changed_query(model, index).all() if self._has_changes(index, state) else []
+            if not self._apply_changes(index, state, changed):
+                self._drop_index(model, index)
+                index = self._build_index(model, self._names_query(model).all(), self._state_query(model).one())
+        return index
+
+    def _names_query(self, model):
+        # soft-deleted rows are removed from a built index by remove_entity
+        return db.session.query(model.id, model.name).filter(model.deleted_at.is_(None))
+
+    def _state_query(self, model):
+        live = model.deleted_at.is_(None)
+        return db.session.query(
+            db.func.count(db.case((live, model.id))).label('live_count'),
+            db.func.sum(db.case((live, model.id))).label('live_id_sum'),
+            db.func.max(model.updated_at).label('updated_at')
+        )
+
+    def _changed_query(self, model, index):
+        return db.session.query(model.id, model.name, model.deleted_at).filter(
+            model.updated_at >= index.synced_to - self.SYNC_MARGIN
+        )
+
+    def _sync_due(self, index):
+        return time.monotonic() - index.checked_at >= self.SYNC_SECONDS
+
+    def _has_changes(self, index, state):
+        updated_at = helper.as_datetime(state.updated_at)
+        if updated_at is None:
+            return False
+        if index.synced_to is None or updated_at > index.synced_to:
+            return True
+        # shortly after the mark, a write stamped before it may still be committing
+        return datetime.utcnow() - index.synced_to < self.SYNC_MARGIN
+
+    def _apply_changes(self, index, state, changed):
+        # False when the index no longer matches the live rows and must be rebuilt
+        with self._lock:
+            for row in changed:
+                if row.deleted_at is None:
+                    index.add(row.id, row.name)
+                else:
+                    index.remove(row.id)
+            if changed:
+                index.synced_to = helper.as_datetime(state.updated_at)
+            index.checked_at = time.monotonic()
+            return (len(index.names), sum(index.names)) == (state.live_count, state.live_id_sum or 0)
+
+    def _drop_index(self, model, index):
+        with self._lock:
+            if self._indexes.get(model.__tablename__) is index:
+                del self._indexes[model.__tablename__]
+
+    def _build_index(self, model, rows, state):
+        with self._lock:
+            index = self._indexes.get(model.__tablename__)
+            if index is None:
+                index = NgramIndex(self.n)
+                for row in rows:
+                    index.add(row.id, row.name)
+                index.synced_to = helper.as_datetime(state.updated_at)
+                index.checked_at = time.monotonic()
+                self._indexes[model.__tablename__] = index
+        return index
+
+class NgramIndex(object):
+    def __init__(self, n=3):
+        self.n = n
+        self.names = {}
+        self.postings = {}
+        # the newest updated_at this index has read, and when the table was last checked
+        self.synced_to = None
+        self.checked_at = 0.0
+
+    def add(self, entity_id, name):
+        self.remove(entity_id)
+        self.names[entity_id] = name
+        for gram in self._grams(name.lower()):
+            self.postings.setdefault(gram, set()).add(entity_id)
+
+    def remove(self, entity_id):
+        name = self.names.pop(entity_id, None)
+        if name is None:
+            return
+        for gram in self._grams(name.lower()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(entity_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, term, limit):
+        term = term.lower()
+        grams = self._grams(term)
+        if grams:
+            candidates = None
+            for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+                ids = self.postings.get(gram)
+                if not ids:
+                    return [], 0
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return [], 0
+        else:
+            # terms shorter than n have no grams to look up
+            candidates = self.names.keys()
+
+        matches = []
+        for entity_id in candidates:
+            name = self.names[entity_id]
+            position = name.lower().find(term)
+            if position >= 0:
+                matches.append(((position != 0, position, len(name), name.lower()), entity_id, name))
+        matches.sort()
+        return [(entity_id, name) for _, entity_id, name in matches[:limit]], len(matches)
+
+    def _grams(self, text):
+        return set(text[i:i + self.n] for i in range(len(text) - self.n + 1))
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        name = current_app.config.get('SEARCH_BACKEND')
+        if name is None:
+            name = 'postgres' if db.engine.dialect.name == 'postgresql' else 'ngram'
+        _backend = PostgresSearchBackend() if name == 'postgres' else NgramSearchBackend()
+    return _backend
+
+def search(model, term, limit=None):
+    limit = limit or current_app.config.get('SEARCH_RESULT_LIMIT', DEFAULT_LIMIT)
+    matches, total = get_backend().search(model, term, limit)
+    counts = get_upcoming_show_counts(model, [entity_id for entity_id, _ in matches])
+    return _format_results(matches, total, counts)
+
+async def search_async(model, term, limit=None):
+    limit = limit or current_app.config.get('SEARCH_RESULT_LIMIT', DEFAULT_LIMIT)
+    matches, total = await get_backend().search_async(model, term, limit)
+    ids = [entity_id for entity_id, _ in matches]
+    counts = dict(await aio.fetch(upcoming_show_counts_query(model, ids))) if ids else {}
+    return _format_results(matches, total, counts)
+
+def _format_results(matches, total, counts):
+    return {
+        "count": total,
+        "data": [
+            {
+                "id": entity_id,
+                "name": name,
+                "num_upcoming_shows": counts.get(entity_id, 0)
+            } for entity_id, name in matches
+        ]
+    }
+
+def get_upcoming_show_counts(model, ids):
+    if not ids:
+        return {}
+    return dict(upcoming_show_counts_query(model, ids).all())
+
+def upcoming_show_counts_query(model, ids):
+    # the denormalized counter, kept current by helpers.counters
+    return db.session.query(model.id, model.upcoming_shows_count).filter(model.id.in_(ids))
+
+def index_entity(model, entity_id, name):
+    get_backend().add(model, entity_id, name)
+
+def remove_entity(model, entity_id):
+    get_backend().remove(model, entity_id)
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
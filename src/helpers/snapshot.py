@@ -0,0 +1,284 @@
+import io
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex, DropIndex
+from model import db, Genre, Venue, Artist, Show, venue_genres, artist_genres
+
+# A snapshot is a directory: manifest.json plus, per table, zlib-compressed
+# chunks of up to CHUNK_ROWS rows stored column by column. Integer and
+# datetime columns are delta-encoded when they have no NULLs, so primary keys
+# and sorted timestamps shrink to runs of small numbers before compression.
+FORMAT_VERSION = 1
+CHUNK_ROWS = 50000
+COMPRESSION_LEVEL = 6
+MANIFEST = 'manifest.json'
+
+# parents first, so every foreign key of a restored chunk already resolves
+TABLES = [Genre.__table__, Venue.__table__, Artist.__table__, venue_genres, artist_genres, Show.__table__]
+
+EPOCH = datetime(1970, 1, 1)
+
+class SnapshotError(Exception):
+    pass
+
+class SnapshotReport(object):
+    def __init__(self):
+        self.tables = {}
+        self.elapsed = 0.0
+
+    def add(self, table, rows, size):
+        counts = self.tables.setdefault(table, {"rows": 0, "bytes": 0})
+        counts["rows"] += rows
+        counts["bytes"] += size
+
+    def to_dict(self):
+        return {
+            "tables": self.tables,
+            "rows": sum(counts["rows"] for counts in self.tables.values()),
+            "bytes": sum(counts["bytes"] for counts in self.tables.values()),
+            "seconds": round(self.elapsed, 3)
+        }
+
+#  Export
+#  ----------------------------------------------------------------
+
+def export_snapshot(path, chunk_rows=CHUNK_ROWS):
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        raise SnapshotError('%s already holds a snapshot' % path)
+    start = time.perf_counter()
+    report = SnapshotReport()
+    manifest = {
+        "format": FORMAT_VERSION,
+        "revision": None,
+        "created_at": datetime.utcnow().isoformat(),
+        "tables": {}
+    }
+    # stream_results asks the driver for a server-side cursor, so memory stays
+    # bounded by one chunk however large the tables are
+    with db.engine.connect() as connection:
+        manifest["revision"] = _current_revision(connection)
+        connection = connection.execution_options(stream_results=True)
+        for table in TABLES:
+            os.makedirs(os.path.join(path, table.name), exist_ok=True)
+            columns = [column.name for column in table.columns]
+            chunks = []
+            rows = 0
+            result = connection.execute(table.select().order_by(*table.primary_key.columns))
+            for part in result.partitions(chunk_rows):
+                name = '%s/%06d.chunk' % (table.name, len(chunks))
+                data = _encode_chunk(table, part)
+                with open(os.path.join(path, name), 'wb') as f:
+                    f.write(data)
+                chunks.append(name)
+                rows += len(part)
+                report.add(table.name, len(part), len(data))
+            manifest["tables"][table.name] = {"columns": columns, "rows": rows, "chunks": chunks}
+    # written last: a directory without a manifest is an interrupted export
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+#  Restore
+#  ----------------------------------------------------------------
+
+def restore_snapshot(path, replace=False):
+    manifest = read_manifest(path)
+    start = time.perf_counter()
+    report = SnapshotReport()
+    # one transaction: a failed restore leaves the database as it was
+    with db.engine.begin() as connection:
+        revision = _current_revision(connection)
+        if manifest["revision"] != revision:
+            raise SnapshotError('snapshot is at revision %s, the database at %s; run flask db upgrade/downgrade first' % (
+                manifest["revision"], revision))
+        for table in TABLES:
+            if table.name not in manifest["tables"]:
+                raise SnapshotError('snapshot has no %s table' % table.name)
+            missing = set(column.name for column in table.columns) - set(manifest["tables"][table.name]["columns"])
+            if missing:
+                raise SnapshotError('snapshot of %s lacks columns: %s' % (table.name, ', '.join(sorted(missing))))
+        if replace:
+            for table in reversed(TABLES):
+                connection.execute(table.delete())
+        else:
+            for table in TABLES:
+                if connection.execute(db.select(db.func.count()).select_from(table)).scalar():
+                    raise SnapshotError('%s is not empty; pass --replace to overwrite it' % table.name)
+
+        # loading into bare tables and building each index once at the end is
+        # much cheaper than maintaining every index row by row
+        drops, creates = _deferred_ddl(connection)
+        for drop in drops:
+            connection.execute(drop)
+        for table in TABLES:
+            entry = manifest["tables"][table.name]
+            for name in entry["chunks"]:
+                with open(os.path.join(path, name), 'rb') as f:
+                    data = f.read()
+                rows = _decode_chunk(table, data)
+                _bulk_insert(connection, table, rows)
+                report.add(table.name, len(rows), len(data))
+        for create in creates:
+            connection.execute(create)
+        _reset_sequences(connection)
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execution_options(isolation_level='AUTOCOMMIT').execute(db.text('ANALYZE'))
+        else:
+            connection.execute(db.text('ANALYZE'))
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError('%s has no %s; is the export complete?' % (path, MANIFEST))
+    if manifest.get("format") != FORMAT_VERSION:
+        raise SnapshotError('unsupported snapshot format: %s' % manifest.get("format"))
+    return manifest
+
+#  Chunks
+#  ----------------------------------------------------------------
+
+def _encode_chunk(table, rows):
+    columns = {}
+    for index, column in enumerate(table.columns):
+        values = [row[index] for row in rows]
+        kind = _kind(column)
+        if kind == 'datetime':
+            values = [None if value is None else _to_micros(value) for value in values]
+        encoding = 'plain'
+        if kind in ('int', 'datetime') and values and None not in values:
+            values = [values[0]] + [b - a for a, b in zip(values, values[1:])]
+            encoding = 'delta'
+        columns[column.name] = {"encoding": encoding, "values": values}
+    raw = json.dumps({"rows": len(rows), "columns": columns}, separators=(',', ':'))
+    return zlib.compress(raw.encode('utf-8'), COMPRESSION_LEVEL)
+
+def _decode_chunk(table, data):
+    chunk = json.loads(zlib.decompress(data).decode('utf-8'))
+    decoded = []
+    for column in table.columns:
+        stored = chunk["columns"][column.name]
+        values = stored["values"]
+        if stored["encoding"] == 'delta':
+            total = 0
+            undeltaed = []
+            for delta in values:
+                total += delta
+                undeltaed.append(total)
+            values = undeltaed
+        if _kind(column) == 'datetime':
+            values = [None if value is None else EPOCH + timedelta(microseconds=value) for value in values]
+        decoded.append((column.name, values))
+    return [
+        {name: values[i] for name, values in decoded}
+        for i in range(chunk["rows"])
+    ]
+
+def _kind(column):
+    if isinstance(column.type, db.DateTime):
+        return 'datetime'
+    if isinstance(column.type, db.Integer):
+        return 'int'
+    return 'plain'
+
+def _to_micros(value):
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+#  Loading
+#  ----------------------------------------------------------------
+
+def _bulk_insert(connection, table, rows):
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        _copy_rows(connection, table, rows)
+    else:
+        connection.execute(table.insert(), rows)
+
+def _copy_rows(connection, table, rows):
+    # COPY in text format: one round trip per chunk, no per-row statement overhead
+    columns = [column.name for column in table.columns]
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row[name]) for name in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+    preparer = connection.dialect.identifier_preparer
+    sql = 'COPY %s (%s) FROM STDIN' % (
+        preparer.format_table(table), ', '.join(preparer.quote(name) for name in columns))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+def _deferred_ddl(connection):
+    # drop and create statements, each list in the order to run it, for
+    # everything that can be built after the load
+    if connection.dialect.name == 'postgresql':
+        return _postgres_deferred_ddl(connection)
+    # elsewhere only the model's secondary indexes; constraints stay in place
+    indexes = [index for table in TABLES for index in table.indexes]
+    return [DropIndex(index) for index in indexes], [CreateIndex(index) for index in indexes]
+
+def _postgres_deferred_ddl(connection):
+    # read from the catalog so migration-only objects (trigram indexes, the
+    # overlap exclusion constraints) are deferred too. Indexes come back first
+    # so foreign keys are re-validated after the indexes they can use exist.
+    tables = [connection.dialect.identifier_preparer.format_table(table) for table in TABLES]
+    indexes = connection.execute(db.text(
+        'SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid) FROM pg_index i '
+        'WHERE i.indrelid = ANY (CAST(:tables AS regclass[])) AND NOT i.indisprimary '
+        'AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)'
+    ), {"tables": tables}).fetchall()
+    constraints = connection.execute(db.text(
+        "SELECT c.conrelid::regclass::text, quote_ident(c.conname), pg_get_constraintdef(c.oid) FROM pg_constraint c "
+        "WHERE c.conrelid = ANY (CAST(:tables AS regclass[])) AND c.contype IN ('f', 'u', 'x') "
+        "ORDER BY c.contype = 'f'"
+    ), {"tables": tables}).fetchall()
+    ddl = [(db.text('DROP INDEX %s' % name), db.text(definition)) for name, definition in indexes]
+    ddl += [
+        (db.text('ALTER TABLE %s DROP CONSTRAINT %s' % (table, name)),
+         db.text('ALTER TABLE %s ADD CONSTRAINT %s %s' % (table, name, definition)))
+        for table, name, definition in constraints
+    ]
+    # foreign keys go first when dropping, last when creating
+    drops = [drop for drop, _ in reversed(ddl)]
+    creates = [create for _, create in ddl]
+    return drops, creates
+
+def _reset_sequences(connection):
+    # rows came in with their ids; point the id sequences past them
+    if connection.dialect.name != 'postgresql':
+        return
+    for model in (Genre, Venue, Artist):
+        connection.execute(db.text(
+            'SELECT setval(\'"%s_id_seq"\', COALESCE(MAX(id), 0) + 1, false) FROM "%s"'
+            % (model.__tablename__, model.__tablename__)
+        ))
+
+def _current_revision(connection):
+    if not inspect(connection).has_table('alembic_version'):
+        return None
+    return connection.execute(db.text('SELECT version_num FROM alembic_version')).scalar()
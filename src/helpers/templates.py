@@ -0,0 +1,51 @@
+import time
+from jinja2 import FileSystemBytecodeCache
+
+TEMPLATE_EXTENSIONS = ('.html',)
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    # a miss means the template was parsed and compiled from source
+    def __init__(self, directory=None):
+        FileSystemBytecodeCache.__init__(self, directory)
+        self.hits = 0
+        self.misses = 0
+
+    def load_bytecode(self, bucket):
+        FileSystemBytecodeCache.load_bytecode(self, bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+def init_app(app):
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE', True)
+    app.config.setdefault('TEMPLATE_CACHE_DIR', None)
+    app.config.setdefault('TEMPLATE_PRECOMPILE', True)
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        # the loader consults the environment's cache on every (re)compile,
+        # so setting it before the first render is enough
+        app.jinja_env.bytecode_cache = CountingBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+    if app.config['TEMPLATE_PRECOMPILE']:
+        count, elapsed = precompile(app)
+        app.logger.info('precompiled %d templates in %.1fms', count, elapsed * 1000)
+
+def template_names(app):
+    return [name for name in app.jinja_env.list_templates() if name.endswith(TEMPLATE_EXTENSIONS)]
+
+def precompile(app):
+    # loads every template into the environment's in-memory cache (and the
+    # bytecode cache, when enabled) so the first request does not parse them
+    start = time.perf_counter()
+    names = template_names(app)
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - start
+
+def bytecode_cache_stats(app):
+    cache = app.jinja_env.bytecode_cache
+    if isinstance(cache, CountingBytecodeCache):
+        return cache.stats()
+    return {}
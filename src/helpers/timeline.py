@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime
+from model import db, Artist, Venue, Show
+from helpers import aio, deletion
+
+def get_venue_timeline(venue_id, now=None):
+    return _get_timeline(venue_timeline_queries(venue_id, now))
+
+def get_artist_timeline(artist_id, now=None):
+    return _get_timeline(artist_timeline_queries(artist_id, now))
+
+async def get_venue_timeline_async(venue_id, now=None):
+    return await _get_timeline_async(venue_timeline_queries(venue_id, now))
+
+async def get_artist_timeline_async(artist_id, now=None):
+    return await _get_timeline_async(artist_timeline_queries(artist_id, now))
+
+def venue_timeline_queries(venue_id, now=None):
+    # shows with a soft-deleted artist are left out of the counts as well as the lists
+    criterion = db.and_(Show.venue_id == venue_id, Show.artist_id.notin_(deletion.deleted_ids(Artist)))
+    query = db.session.query(
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time
+    ).join(Artist, Artist.id == Show.artist_id).filter(criterion)
+    return _timeline_queries(query, criterion, now)
+
+def artist_timeline_queries(artist_id, now=None):
+    criterion = db.and_(Show.artist_id == artist_id, Show.venue_id.notin_(deletion.deleted_ids(Venue)))
+    query = db.session.query(
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.start_time
+    ).join(Venue, Venue.id == Show.venue_id).filter(criterion)
+    return _timeline_queries(query, criterion, now)
+
+def get_show_counts(criterion, now=None):
+    return show_counts_query(criterion, now).one()
+
+def show_counts_query(criterion, now=None):
+    now = now or datetime.now()
+    past = db.session.query(db.func.count(Show.start_time)).filter(
+        criterion, Show.start_time <= now
+    ).label('past_shows_count')
+    upcoming = db.session.query(db.func.count(Show.start_time)).filter(
+        criterion, Show.start_time > now
+    ).label('upcoming_shows_count')
+    return db.session.query(past, upcoming)
+
+def _timeline_queries(query, criterion, now):
+    # a single "now" keeps the lists and the counts consistent with each other
+    now = now or datetime.now()
+    return (
+        show_counts_query(criterion, now),
+        query.filter(Show.start_time <= now).order_by(Show.start_time.desc()),
+        query.filter(Show.start_time > now).order_by(Show.start_time)
+    )
+
+def _get_timeline(queries):
+    counts, past, upcoming = queries
+    return format_timeline(counts.one(), past.all(), upcoming.all())
+
+async def _get_timeline_async(queries):
+    counts, past, upcoming = queries
+    # the three statements are independent, so they share one round trip's worth of waiting
+    counts, past_shows, upcoming_shows = await asyncio.gather(
+        aio.fetch_one(counts), aio.fetch(past), aio.fetch(upcoming)
+    )
+    return format_timeline(counts, past_shows, upcoming_shows)
+
+def format_timeline(counts, past_shows, upcoming_shows):
+    return {
+        "past_shows": _format_rows(past_shows),
+        "upcoming_shows": _format_rows(upcoming_shows),
+        "past_shows_count": counts.past_shows_count,
+        "upcoming_shows_count": counts.upcoming_shows_count
+    }
+
+def _format_rows(rows):
+    # start_time stays a datetime; the datetime filter formats it in the template
+    return [row._asdict() for row in rows]
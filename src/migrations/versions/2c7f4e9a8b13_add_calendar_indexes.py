@@ -0,0 +1,25 @@
+"""add calendar indexes
+
+Revision ID: 2c7f4e9a8b13
+Revises: 9b3c6d2e7f18
+Create Date: 2026-10-18 19:02:36.415870
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2c7f4e9a8b13'
+down_revision = '9b3c6d2e7f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shows_start_time_venue_id_artist_id', 'shows', ['start_time', 'venue_id', 'artist_id'], unique=False)
+    op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_city_state', table_name='Venue')
+    op.drop_index('ix_shows_start_time_venue_id_artist_id', table_name='shows')
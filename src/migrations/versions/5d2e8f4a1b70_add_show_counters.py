@@ -0,0 +1,42 @@
+"""add show counters
+
+Revision ID: 5d2e8f4a1b70
+Revises: e4b7a1d09c35
+Create Date: 2026-10-18 15:02:41.530117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8f4a1b70'
+down_revision = 'e4b7a1d09c35'
+branch_labels = None
+depends_on = None
+
+TABLES = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    for table, show_column in TABLES:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_time', sa.DateTime(), nullable=True))
+        op.create_index(op.f('ix_%s_next_show_time' % table), table, ['next_show_time'], unique=False)
+        # backfill once; from here on the app keeps the counters current
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{column} = "{table}".id AND shows.start_time > CURRENT_TIMESTAMP), '
+            'past_shows_count = (SELECT count(*) FROM shows WHERE shows.{column} = "{table}".id AND shows.start_time <= CURRENT_TIMESTAMP), '
+            'next_show_time = (SELECT min(start_time) FROM shows WHERE shows.{column} = "{table}".id AND shows.start_time > CURRENT_TIMESTAMP)'
+            .format(table=table, column=show_column)
+        )
+
+
+def downgrade():
+    for table, _ in reversed(TABLES):
+        op.drop_index(op.f('ix_%s_next_show_time' % table), table_name=table)
+        op.drop_column(table, 'next_show_time')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
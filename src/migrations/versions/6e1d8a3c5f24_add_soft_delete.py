@@ -0,0 +1,31 @@
+"""add soft delete
+
+Revision ID: 6e1d8a3c5f24
+Revises: 2c7f4e9a8b13
+Create Date: 2026-10-18 20:41:09.128374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1d8a3c5f24'
+down_revision = '2c7f4e9a8b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        # partial: only the few rows waiting for the purge are indexed
+        op.create_index('ix_%s_deleted_at' % table, table, ['deleted_at'], unique=False,
+                        postgresql_where=sa.text('deleted_at IS NOT NULL'),
+                        sqlite_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_%s_deleted_at' % table, table_name=table)
+        op.drop_column(table, 'deleted_at')
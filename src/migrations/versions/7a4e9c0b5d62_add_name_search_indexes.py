@@ -0,0 +1,38 @@
+"""add name search indexes
+
+Revision ID: 7a4e9c0b5d62
+Revises: 3f1c2a9d7e41
+Create Date: 2026-10-18 10:04:51.630118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4e9c0b5d62'
+down_revision = '3f1c2a9d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # trigram and full-text indexes only exist on postgres; other databases
+    # fall back to the in-process n-gram index in helpers/search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE INDEX "ix_{0}_name_trgm" ON "{0}" USING gin (name gin_trgm_ops)'.format(table)
+        )
+        op.execute(
+            'CREATE INDEX "ix_{0}_name_tsv" ON "{0}" USING gin (to_tsvector(\'simple\', name))'.format(table)
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('Venue', 'Artist'):
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_tsv"'.format(table))
+        op.execute('DROP INDEX IF EXISTS "ix_{0}_name_trgm"'.format(table))
@@ -0,0 +1,49 @@
+"""add show end time
+
+Revision ID: 9b3c6d2e7f18
+Revises: 5d2e8f4a1b70
+Create Date: 2026-10-18 18:21:07.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3c6d2e7f18'
+down_revision = '5d2e8f4a1b70'
+branch_labels = None
+depends_on = None
+
+DEFAULT_SHOW_MINUTES = 120
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if dialect == 'sqlite':
+        op.execute("UPDATE shows SET end_time = datetime(start_time, '+%d minutes')" % DEFAULT_SHOW_MINUTES)
+    else:
+        op.execute("UPDATE shows SET end_time = start_time + interval '%d minutes'" % DEFAULT_SHOW_MINUTES)
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_shows_end_after_start', 'end_time > start_time')
+
+    if dialect == 'postgresql':
+        # the database itself refuses overlapping bookings, even from
+        # concurrent requests; fails if existing shows already overlap
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            op.execute(
+                'ALTER TABLE shows ADD CONSTRAINT "ex_shows_{0}_overlap" '
+                'EXCLUDE USING gist ({0} WITH =, tsrange(start_time, end_time) WITH &&)'.format(column)
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in ('artist_id', 'venue_id'):
+            op.execute('ALTER TABLE shows DROP CONSTRAINT IF EXISTS "ex_shows_{0}_overlap"'.format(column))
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_constraint('ck_shows_end_after_start', type_='check')
+        batch_op.drop_column('end_time')
@@ -0,0 +1,36 @@
+"""add jobs
+
+Revision ID: a3f9c7e2d416
+Revises: 6e1d8a3c5f24
+Create Date: 2026-10-18 22:05:47.613290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9c7e2d416'
+down_revision = '6e1d8a3c5f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('state', sa.String(length=16), server_default='queued', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_state_run_at', 'jobs', ['state', 'run_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_jobs_state_run_at', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,86 @@
+"""normalize genres
+
+Revision ID: c81d5f3e2a97
+Revises: 7a4e9c0b5d62
+Create Date: 2026-10-18 11:22:37.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81d5f3e2a97'
+down_revision = '7a4e9c0b5d62'
+branch_labels = None
+depends_on = None
+
+ENTITIES = (
+    ('Venue', 'venue_genres', 'venue_id'),
+    ('Artist', 'artist_genres', 'artist_id'),
+)
+
+
+def upgrade():
+    genres = op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, column in ENTITIES:
+        op.create_table(association,
+        sa.Column(column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([column], [table + '.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(column, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id'.format(association), association, ['genre_id'], unique=False)
+
+    # move the comma-joined strings into the association tables
+    bind = op.get_bind()
+    genre_ids = {}
+    for table, association, column in ENTITIES:
+        rows = bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(table))).fetchall()
+        new_genres = []
+        links = []
+        for entity_id, value in rows:
+            names = []
+            for name in (value or '').split(','):
+                name = name.strip()
+                if name and name not in names:
+                    names.append(name)
+            for name in names:
+                if name not in genre_ids:
+                    genre_ids[name] = len(genre_ids) + 1
+                    new_genres.append({'id': genre_ids[name], 'name': name})
+                links.append({column: entity_id, 'genre_id': genre_ids[name]})
+        if new_genres:
+            op.bulk_insert(genres, new_genres)
+        if links:
+            op.bulk_insert(sa.table(association, sa.column(column), sa.column('genre_id')), links)
+        op.drop_column(table, 'genres')
+
+    if bind.dialect.name == 'postgresql' and genre_ids:
+        op.execute("SELECT setval('genres_id_seq', (SELECT max(id) FROM genres))")
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, association, column in ENTITIES:
+        op.add_column(table, sa.Column('genres', sa.String(length=120), nullable=True))
+        rows = bind.execute(sa.text(
+            'SELECT a.{0}, g.name FROM {1} a JOIN genres g ON g.id = a.genre_id ORDER BY a.{0}, g.name'.format(column, association)
+        )).fetchall()
+        joined = {}
+        for entity_id, name in rows:
+            joined.setdefault(entity_id, []).append(name)
+        for entity_id, names in joined.items():
+            bind.execute(
+                sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(table)),
+                {'genres': ','.join(names), 'id': entity_id}
+            )
+        op.drop_index('ix_{}_genre_id'.format(association), table_name=association)
+        op.drop_table(association)
+    op.drop_table('genres')
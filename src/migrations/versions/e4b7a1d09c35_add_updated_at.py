@@ -0,0 +1,26 @@
+"""add updated_at
+
+Revision ID: e4b7a1d09c35
+Revises: c81d5f3e2a97
+Create Date: 2026-10-18 12:40:15.271846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7a1d09c35'
+down_revision = 'c81d5f3e2a97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'shows'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade():
+    for table in ('shows', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
@@ -1,37 +1,73 @@
-from flask import Flask
-from flask_moment import Moment
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, timedelta
+from helpers.routing import RoutingSQLAlchemy
 
 #----------------------------------------------------------------------------#
-# App Config.
+# Database.
 #----------------------------------------------------------------------------#
-app = Flask(__name__)
-app.config.from_object('config')
-moment = Moment(app)
-db = SQLAlchemy(app)
 
-# TODO: connect to a local postgresql database
-migrate = Migrate(app, db)
+# bound to an application by app.create_app
+db = RoutingSQLAlchemy()
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+DEFAULT_SHOW_MINUTES = 120
+# conflict checks only look this far back for shows still running
+MAX_SHOW_MINUTES = 12 * 60
+
+def _default_end_time(context):
+    return context.get_current_parameters()['start_time'] + timedelta(minutes=DEFAULT_SHOW_MINUTES)
+
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        # calendar listings: a date window across every venue, in keyset order
+        db.Index('ix_shows_start_time_venue_id_artist_id', 'start_time', 'venue_id', 'artist_id'),
+        db.CheckConstraint('end_time > start_time', name='ck_shows_end_after_start'),
+    )
 
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete="CASCADE"), primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete="CASCADE"), primary_key=True)
     start_time = db.Column(db.DateTime, primary_key=True)
-    artist = db.relationship('Artist', backref=db.backref('shows', lazy =True))
-    venue = db.relationship('Venue', backref=db.backref('shows', lazy =True))
+    end_time = db.Column(db.DateTime, nullable=False, default=_default_end_time)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
+    # passive_deletes: deleting a venue or artist leaves its shows to the
+    # database's ON DELETE CASCADE instead of loading them first
+    artist = db.relationship('Artist', backref=db.backref('shows', lazy =True, passive_deletes=True))
+    venue = db.relationship('Venue', backref=db.backref('shows', lazy =True, passive_deletes=True))
+
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete="CASCADE"), primary_key=True),
+    db.Index('ix_venue_genres_genre_id', 'genre_id')
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete="CASCADE"), primary_key=True),
+    db.Index('ix_artist_genres_genre_id', 'genre_id')
+)
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_city_state', 'city', 'state'),
+        # only soft-deleted rows, which helpers.deletion looks up
+        db.Index('ix_Venue_deleted_at', 'deleted_at', postgresql_where=db.text('deleted_at IS NOT NULL'), sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', passive_deletes=True)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -41,18 +77,51 @@ class Venue(db.Model):
     website = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String())
+    # kept current by helpers.counters
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
+    # set by helpers.deletion: hidden everywhere at once, removed later by the purge
+    deleted_at = db.Column(db.DateTime)
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_deleted_at', 'deleted_at', postgresql_where=db.text('deleted_at IS NOT NULL'), sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', passive_deletes=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String())
\ No newline at end of file
+    seeking_description = db.Column(db.String())
+    # kept current by helpers.counters
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_time = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
+    deleted_at = db.Column(db.DateTime)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # workers look for the earliest due row among queued and lease-expired running ones
+        db.Index('ix_jobs_state_run_at', 'state', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    # see helpers.jobs: queued until run_at; running until its lease (run_at) expires; failed for good
+    state = db.Column(db.String(16), nullable=False, default='queued', server_default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    run_at = db.Column(db.DateTime, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=db.func.now())
@@ -0,0 +1,20 @@
+import pytest
+import config
+from app import create_app
+from model import db
+from helpers import search
+from helpers.cache import response_cache
+
+@pytest.fixture
+def make_app(tmp_path):
+    # a fresh app on its own sqlite files; settings override TestingConfig
+    def make(**settings):
+        settings.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///%s' % (tmp_path / 'primary.db'))
+        app = create_app(type('Config', (config.TestingConfig,), settings))
+        with app.app_context():
+            db.create_all()
+        # the cache and the search index are module-level; start each app without them
+        response_cache.configure(app.config)
+        search._backend = None
+        return app
+    return make
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+from model import db, Venue
+from helpers import aio
+import asgi
+
+async def request(application, method, path, headers=()):
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+        'query_string': b'', 'headers': [(b'host', b'localhost')] + list(headers),
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0)
+    }
+    messages = [{'type': 'http.request', 'body': b''}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+async def shutdown(application):
+    messages = [{'type': 'lifespan.shutdown'}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    await application({'type': 'lifespan'}, receive, send)
+
+def serve(app, main):
+    application = asgi.AsgiApp(app)
+
+    async def run():
+        try:
+            return await main(application)
+        finally:
+            await shutdown(application)
+    return asyncio.run(run())
+
+def make_asgi_app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(Venue(id=1, name='The Hall', city='Austin', state='TX', address='1 Main St'))
+        db.session.commit()
+    return app
+
+def test_pages_match_the_wsgi_app(make_app):
+    app = make_asgi_app(make_app)
+    expected = {path: app.test_client().get(path) for path in ('/venues/1', '/venues/2', '/', '/nowhere')}
+
+    async def main(application):
+        return {path: await request(application, 'GET', path) for path in expected}
+
+    for path, (status, headers, body) in serve(app, main).items():
+        assert status == expected[path].status_code, path
+        assert body == expected[path].data, path
+
+    async def revalidate(application):
+        status, headers, _ = await request(application, 'GET', '/venues/1')
+        return await request(application, 'GET', '/venues/1', [(b'if-none-match', headers[b'etag'])])
+
+    assert serve(app, revalidate)[0] == 304
+
+def test_requests_waiting_on_the_database_overlap(make_app):
+    app = make_asgi_app(make_app)
+
+    def slow(*args, **kwargs):
+        await_only(asyncio.sleep(0.2))
+
+    event.listen(aio.database.get_engine(app).sync_engine, 'before_cursor_execute', slow)
+
+    async def main(application):
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[request(application, 'GET', '/shows') for _ in range(10)])
+        return time.perf_counter() - start, [status for status, _, _ in responses]
+
+    elapsed, statuses = serve(app, main)
+    assert statuses == [200] * 10
+    # one statement per page: run one after another they would take 2s
+    assert elapsed < 1.0
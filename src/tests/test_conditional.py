@@ -0,0 +1,41 @@
+import time
+from datetime import datetime, timedelta
+from model import db, Venue, Artist, Show
+
+def add_venue_with_show(app, start_time):
+    with app.app_context():
+        db.session.add(Venue(id=1, name='The Hall', city='Austin', state='TX'))
+        db.session.add(Artist(id=1, name='The Band', city='Austin', state='TX'))
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=start_time, end_time=start_time + timedelta(hours=2)))
+        db.session.commit()
+
+def test_show_passing_into_the_past_is_not_served_from_cache(make_app):
+    app = make_app(CACHE_ENABLED=True)
+    add_venue_with_show(app, datetime.now() + timedelta(seconds=1))
+    client = app.test_client()
+
+    response = client.get('/venues/1')
+    assert '1 Upcoming Show' in response.get_data(as_text=True)
+    etag = response.headers['ETag']
+
+    time.sleep(1.2)
+    # no write happened, but the show started: new ETag, and a body to match it
+    response = client.get('/venues/1')
+    assert response.headers['ETag'] != etag
+    body = response.get_data(as_text=True)
+    assert '0 Upcoming Shows' in body and '1 Past Show' in body
+
+    revalidated = client.get('/venues/1', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+def test_write_before_invalidation_is_not_served_from_cache(make_app):
+    app = make_app(CACHE_ENABLED=True)
+    add_venue_with_show(app, datetime.now() + timedelta(days=1))
+    client = app.test_client()
+    assert 'The Hall' in client.get('/venues/1').get_data(as_text=True)
+
+    # committed, but response_cache.invalidate() has not run yet
+    with app.app_context():
+        db.session.query(Venue).filter(Venue.id == 1).update({Venue.name: 'The New Hall', Venue.updated_at: datetime.utcnow()})
+        db.session.commit()
+    assert 'The New Hall' in client.get('/venues/1').get_data(as_text=True)
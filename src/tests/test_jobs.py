@@ -0,0 +1,36 @@
+import threading
+import time
+from model import db, Job
+from helpers import jobs
+
+runs = []
+
+@jobs.task('test-slow')
+def slow_job(seconds):
+    runs.append(threading.current_thread().name)
+    time.sleep(seconds)
+
+def test_running_job_keeps_its_lease(make_app, monkeypatch):
+    monkeypatch.setattr(jobs, 'LEASE_SECONDS', 0.4)
+    monkeypatch.setattr(jobs, 'RENEW_SECONDS', 0.1)
+    app = make_app()
+    with app.app_context():
+        jobs.enqueue('test-slow', seconds=1.2)
+        db.session.commit()
+
+    def work():
+        with app.app_context():
+            jobs.run_pending()
+            db.session.remove()
+    worker = threading.Thread(target=work)
+    worker.start()
+    time.sleep(0.8)
+    # well past the first lease: another worker must not reclaim the job
+    with app.app_context():
+        assert jobs._claim() is None
+        db.session.remove()
+    worker.join()
+
+    assert len(runs) == 1
+    with app.app_context():
+        assert db.session.query(Job).count() == 0
@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine
+from model import db, Venue
+
+def make_replicated_app(make_app, tmp_path):
+    replica_uri = 'sqlite:///%s' % (tmp_path / 'replica.db')
+    app = make_app(SQLALCHEMY_REPLICA_URIS=[replica_uri])
+    # the same row on both sides, named after the database it lives in
+    with app.app_context():
+        db.session.add(Venue(id=1, name='Primary', city='Austin', state='TX'))
+        db.session.commit()
+    replica = create_engine(replica_uri)
+    db.metadata.create_all(replica)
+    with replica.begin() as connection:
+        connection.execute(Venue.__table__.insert().values(id=1, name='Replica', city='Austin', state='TX'))
+    return app, replica
+
+def venue_name(client):
+    return client.get('/api/v1/venues/1').get_json()['name']
+
+def test_reads_go_to_the_replica(make_app, tmp_path):
+    app, _ = make_replicated_app(make_app, tmp_path)
+    assert venue_name(app.test_client()) == 'Replica'
+
+def test_writes_go_to_the_primary(make_app, tmp_path):
+    app, replica = make_replicated_app(make_app, tmp_path)
+    app.test_client().post('/venues/1/edit', data={'name': 'Renamed', 'city': 'Austin', 'state': 'TX'})
+    with app.app_context():
+        assert db.session.get(Venue, 1).name == 'Renamed'
+    with replica.connect() as connection:
+        assert connection.execute(Venue.__table__.select()).one().name == 'Replica'
+
+def test_writer_reads_the_primary_until_the_pin_expires(make_app, tmp_path):
+    app, _ = make_replicated_app(make_app, tmp_path)
+    writer = app.test_client()
+    other = app.test_client()
+    writer.post('/venues/1/edit', data={'name': 'Renamed', 'city': 'Austin', 'state': 'TX'})
+    assert venue_name(writer) == 'Renamed'
+    # the replica has not caught up, and only the writer is pinned
+    assert venue_name(other) == 'Replica'
+    with writer.session_transaction() as session:
+        session['primary_until'] = 0
+    assert venue_name(writer) == 'Replica'
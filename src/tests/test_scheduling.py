@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+import pytest
+from model import db, Venue, Artist, Show
+from helpers import scheduling, deletion
+
+START = datetime(2040, 1, 1, 20)
+
+def test_shows_of_deleted_artists_block_nothing(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(Venue(id=1, name='The Hall', city='Austin', state='TX'))
+        for id in (1, 2):
+            db.session.add(Artist(id=id, name='Band %d' % id, city='Austin', state='TX'))
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=START, end_time=START + timedelta(hours=2)))
+        db.session.commit()
+        with pytest.raises(scheduling.ShowConflict):
+            scheduling.check_conflicts(1, 2, START, START + timedelta(hours=1))
+
+        deletion.soft_delete(Artist, 1)
+        db.session.commit()
+        scheduling.check_conflicts(1, 2, START, START + timedelta(hours=1))
+        assert scheduling.get_free_slots(1, START, START + timedelta(hours=3)) == [(START, START + timedelta(hours=3))]
+        report = scheduling.book_shows(1, 2, [START], timedelta(hours=1))
+        assert report.count('created') == 1
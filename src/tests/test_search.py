@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from model import db, Venue
+from helpers import search
+
+def test_index_follows_writes_from_other_processes(make_app, monkeypatch):
+    monkeypatch.setattr(search.NgramSearchBackend, 'SYNC_SECONDS', 0)
+    app = make_app(SEARCH_BACKEND='ngram')
+    with app.app_context():
+        for id, name in ((1, 'Blue Hall'), (2, 'Blue Room'), (3, 'Red Barn')):
+            db.session.add(Venue(id=id, name=name, city='Austin', state='TX'))
+        db.session.commit()
+    with app.test_request_context():
+        assert [name for _, name in search.get_backend().search(Venue, 'blue', 10)[0]] == ['Blue Hall', 'Blue Room']
+
+    # another process: an import, an edit and a delete that never call index_entity here
+    other = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    now = datetime.utcnow()
+    table = Venue.__table__
+    with other.begin() as connection:
+        connection.execute(table.insert().values(id=4, name='Blue Note', city='Austin', state='TX', updated_at=now))
+        connection.execute(table.update().where(table.c.id == 3).values(name='Blue Barn', updated_at=now))
+        connection.execute(table.update().where(table.c.id == 1).values(deleted_at=now, updated_at=now))
+    with app.test_request_context():
+        assert [name for _, name in search.get_backend().search(Venue, 'blue', 10)[0]] == ['Blue Barn', 'Blue Note', 'Blue Room']
+
+    # a restore: rows replaced wholesale, with timestamps older than anything indexed
+    with other.begin() as connection:
+        connection.execute(table.delete())
+        connection.execute(table.insert().values(id=7, name='Blue Cellar', city='Austin', state='TX', updated_at=now - timedelta(days=30)))
+    with app.test_request_context():
+        assert [name for _, name in search.get_backend().search(Venue, 'blue', 10)[0]] == ['Blue Cellar']
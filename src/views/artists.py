@@ -0,0 +1,128 @@
+import sys
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from model import db, Artist
+from helpers import helper, timeline, search, facets, conditional, routing, editing, deletion
+from helpers.cache import response_cache
+
+blueprint = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists')
+@response_cache.cached(lambda: ['artists'])
+def artists():
+  filters = facets.get_facet_filters(request.args)
+  data = facets.filter_by_facets(db.session.query(Artist.id, Artist.name), Artist, **filters).all()
+  facet_counts = facets.get_facet_counts(Artist, **filters)
+  return render_template('pages/artists.html', artists=data, facets=facet_counts, filters=filters)
+
+@blueprint.route('/artists/search', methods=['POST'])
+@routing.read_only
+def search_artists():
+  search_term = request.form.get('search_term', '')
+  response = search.search(Artist, search_term)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@blueprint.route('/artists/<int:artist_id>')
+@conditional.conditional(conditional.get_artist_validators)
+@response_cache.cached(lambda artist_id: ['artist:%d' % artist_id])
+def show_artist(artist_id):
+  artist = Artist.query.filter(Artist.id == artist_id, deletion.live(Artist)).first()
+  data = {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": helper.get_genres_list(artist.genres),
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link
+  }
+  data.update(timeline.get_artist_timeline(artist_id))
+  response_cache.tag(*['venue:%d' % show["venue_id"] for show in data["past_shows"] + data["upcoming_shows"]])
+  return render_template('pages/show_artist.html', artist=data)
+
+@blueprint.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  if not deletion.soft_delete(Artist, artist_id):
+    abort(404)
+  try:
+    db.session.commit()
+    search.remove_entity(Artist, artist_id)
+    # venue pages carry an artist:<id> tag for each show, so this reaches them too
+    response_cache.invalidate('artist:%d' % artist_id, 'artists', 'shows')
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  data = editing.load_form_data(Artist, artist_id)
+  if data is None:
+    abort(404)
+  artist, genres = data
+  form = ArtistForm()
+  editing.populate_form(form, Artist, artist, genres)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  try:
+    changed = editing.apply_changes(Artist, artist_id, request.form)
+    if changed:
+      db.session.commit()
+      if 'name' in changed:
+        search.index_entity(Artist, artist_id, request.form.get("name", ""))
+      response_cache.invalidate('artist:%d' % artist_id, 'artists')
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  try:
+    new_artist = Artist(
+    name = request.form.get('name',''),
+    city = request.form.get('city',''),
+    state = request.form.get('state',''),
+    phone = request.form.get('phone',''),
+    genres = facets.get_or_create_genres(request.form.getlist('genres')),
+    facebook_link = request.form.get('facebook_link', ''),
+    website = request.form.get('website',''),
+    image_link = request.form.get('image_link', ''),
+    seeking_venue = bool(request.form.get('seeking_venue', False)),
+    seeking_description = request.form.get('seeking_description', '')
+    )
+    db.session.add(new_artist)
+    db.session.commit()
+    search.index_entity(Artist, new_artist.id, new_artist.name)
+    response_cache.invalidate('artists')
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  except:
+    flash('Artist ' + request.form['name'] + ' could not be listed!')
+    flash(sys.exc_info())
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
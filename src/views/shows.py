@@ -0,0 +1,126 @@
+import sys
+from datetime import date, datetime, timedelta
+from flask import Blueprint, render_template, request, flash, abort
+from model import db, Show, DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
+from helpers import directory, pagination, scheduling, jobs
+from helpers.cache import response_cache
+
+blueprint = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@blueprint.route('/shows')
+@response_cache.cached(lambda: ['shows'])
+def shows():
+  page_size = pagination.get_page_size(request.args.get('limit'))
+  cursor = request.args.get('after')
+  cursor_values = None
+  if cursor:
+    try:
+      cursor_values = pagination.decode_cursor(cursor, [pagination.parse_datetime, int, int])
+    except ValueError:
+      abort(400)
+
+  rows, next_cursor = pagination.keyset_page(
+    directory.shows_query(), [Show.start_time, Show.venue_id, Show.artist_id], cursor_values, page_size)
+
+  data = []
+  for row in rows:
+    data.append(row._asdict())
+    response_cache.tag('venue:%d' % row.venue_id, 'artist:%d' % row.artist_id)
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, limit=page_size)
+
+@blueprint.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  try:
+    form = read_show_form()
+    if form["repeat"]:
+      create_recurring_shows(form)
+      return
+    new_show = Show(
+    artist_id = form["artist_id"],
+    venue_id = form["venue_id"],
+    start_time = form["start_time"],
+    end_time = form["start_time"] + form["duration"],
+    )
+    scheduling.check_exists(new_show.venue_id, new_show.artist_id)
+    scheduling.check_conflicts(new_show.venue_id, new_show.artist_id, new_show.start_time, new_show.end_time)
+    db.session.add(new_show)
+    # the counters, and the venue list showing them, catch up after the response
+    jobs.enqueue('refresh-counters', venue_ids=[new_show.venue_id], artist_ids=[new_show.artist_id])
+    db.session.commit()
+    response_cache.invalidate('venue:%d' % form["venue_id"], 'artist:%d' % form["artist_id"], 'shows')
+    flash('Show was successfully listed!')
+  except (InvalidShow, scheduling.ShowConflict, LookupError) as e:
+    flash('Show could not be listed: ' + str(e))
+    db.session.rollback()
+  except:
+    flash('An error occurred. Show could not be listed')
+    flash(sys.exc_info())
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+class InvalidShow(Exception):
+  pass
+
+def read_show_form():
+  # every field checked before anything is booked, with a message fit to show the user
+  import dateutil.parser
+  form = {}
+  for name in ('venue_id', 'artist_id'):
+    try:
+      form[name] = int(request.form.get(name, ''))
+    except ValueError:
+      raise InvalidShow('%s must be a number' % name)
+  start_time = request.form.get('start_time')
+  try:
+    form["start_time"] = dateutil.parser.parse(start_time) if start_time else datetime.now()
+  except (ValueError, OverflowError):
+    raise InvalidShow('start_time must be a date and time, e.g. 2035-01-01 20:00')
+  try:
+    duration = int(request.form.get('duration_minutes') or DEFAULT_SHOW_MINUTES)
+  except ValueError:
+    duration = 0
+  if not 0 < duration <= MAX_SHOW_MINUTES:
+    raise InvalidShow('duration_minutes must be a number between 1 and %d' % MAX_SHOW_MINUTES)
+  form["duration"] = timedelta(minutes=duration)
+  form["repeat"] = request.form.get('repeat', '')
+  if form["repeat"]:
+    if form["repeat"] not in scheduling.RECURRENCE_STEPS:
+      raise InvalidShow('repeat must be one of: ' + ', '.join(sorted(scheduling.RECURRENCE_STEPS)))
+    try:
+      form["repeat_until"] = date.fromisoformat(request.form.get('repeat_until', ''))
+    except ValueError:
+      raise InvalidShow('repeat_until must be a date (YYYY-MM-DD) for a repeating show')
+    if form["repeat_until"] < form["start_time"].date():
+      raise InvalidShow('repeat_until must not be before the first show')
+  return form
+
+def create_recurring_shows(form):
+  # the repeat fields of the form: every occurrence up to repeat_until in one batch
+  venue_id = form["venue_id"]
+  artist_id = form["artist_id"]
+  try:
+    start_times = scheduling.expand_recurrence(form["start_time"], form["repeat"], until=form["repeat_until"])
+  except ValueError as e:
+    # too many occurrences; the other arguments were checked above
+    raise InvalidShow(str(e))
+  report = scheduling.book_shows(venue_id, artist_id, start_times, form["duration"])
+  db.session.commit()
+  created = report.count('created')
+  if created:
+    response_cache.invalidate('venue:%d' % venue_id, 'artist:%d' % artist_id, 'shows')
+  flash('%d of %d shows were successfully listed!' % (created, len(start_times)))
+  for occurrence in report.occurrences:
+    if occurrence["status"] != 'created':
+      flash('Show on %s was not listed: %s' % (occurrence["start_time"], occurrence["reason"]))
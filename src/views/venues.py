@@ -0,0 +1,133 @@
+import sys
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from model import db, Venue
+from helpers import helper, directory, timeline, search, facets, conditional, routing, editing, deletion
+from helpers.cache import response_cache
+
+blueprint = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues')
+@response_cache.cached(lambda: ['venues'])
+def venues():
+  filters = facets.get_facet_filters(request.args)
+  data = directory.get_venue_areas(**filters)
+  facet_counts = facets.get_facet_counts(Venue, **filters)
+  return render_template('pages/venues.html', areas=data, facets=facet_counts, filters=filters);
+
+@blueprint.route('/venues/search', methods=['POST'])
+@routing.read_only
+def search_venues():
+  search_term = request.form.get('search_term', '')
+  response = search.search(Venue, search_term)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@blueprint.route('/venues/<int:venue_id>')
+@conditional.conditional(conditional.get_venue_validators)
+@response_cache.cached(lambda venue_id: ['venue:%d' % venue_id])
+def show_venue(venue_id):
+
+  venue = Venue.query.filter(Venue.id == venue_id, deletion.live(Venue)).first()
+  data = {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": helper.get_genres_list(venue.genres),
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link
+  }
+  data.update(timeline.get_venue_timeline(venue_id))
+  response_cache.tag(*['artist:%d' % show["artist_id"] for show in data["past_shows"] + data["upcoming_shows"]])
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  try:
+    new_venue = Venue(
+    name = request.form['name'],
+    city = request.form['city'],
+    state = request.form['state'],
+    address = request.form['address'],
+    phone = request.form['phone'],
+    genres = facets.get_or_create_genres(request.form.getlist('genres')),
+    facebook_link = request.form.get('facebook_link', ''),
+    website = request.form.get('website',''),
+    image_link = request.form.get('image_link', ''),
+    seeking_talent = bool(request.form.get('seeking_talent', False)),
+    seeking_description = request.form.get('seeking_description', '')
+    )
+    db.session.add(new_venue)
+    db.session.commit()
+    search.index_entity(Venue, new_venue.id, new_venue.name)
+    response_cache.invalidate('venues')
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  except:
+    flash('Venue ' + request.form['name'] + ' could not be listed!')
+    flash(sys.exc_info())
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+@blueprint.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  if not deletion.soft_delete(Venue, venue_id):
+    abort(404)
+  try:
+    db.session.commit()
+    search.remove_entity(Venue, venue_id)
+    # artist pages carry a venue:<id> tag for each show, so this reaches them too
+    response_cache.invalidate('venue:%d' % venue_id, 'venues', 'shows')
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  data = editing.load_form_data(Venue, venue_id)
+  if data is None:
+    abort(404)
+  venue, genres = data
+  form = VenueForm()
+  editing.populate_form(form, Venue, venue, genres)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  try:
+    changed = editing.apply_changes(Venue, venue_id, request.form)
+    if changed:
+      db.session.commit()
+      if 'name' in changed:
+        search.index_entity(Venue, venue_id, request.form.get("name", ""))
+      response_cache.invalidate('venue:%d' % venue_id, 'venues')
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))